@@ -0,0 +1,201 @@
+from models import db, InsurancePlan, Policy, Quote, DailyPlanStats
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+
+COUNTERS = ('policies_issued', 'premium_total', 'coverage_total', 'quotes_saved')
+UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert, 'mysql': mysql.insert}
+
+
+def _increment(connection, day, plan, **amounts):
+    """
+    Add amounts to the (day, plan) rollup row, creating it on first use.
+    Uses a native upsert so concurrent first writes for the same day and
+    plan cannot collide on the primary key.
+    """
+    table = DailyPlanStats.__table__
+    row = {name: 0 for name in COUNTERS}
+    row.update(amounts)
+    values = dict(day=day, plan_id=plan.id, plan_type=plan.type, provider=plan.provider, **row)
+    dialect = connection.dialect.name
+
+    if dialect in UPSERT_INSERTS:
+        stmt = UPSERT_INSERTS[dialect](table).values(**values)
+        if dialect == 'mysql':
+            connection.execute(stmt.on_duplicate_key_update(
+                {name: table.c[name] + stmt.inserted[name] for name in amounts}
+            ))
+        else:
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.day, table.c.plan_id],
+                set_={name: table.c[name] + stmt.excluded[name] for name in amounts}
+            ))
+        return
+
+    # No native upsert: retry the update if another writer inserted first
+    update = (
+        table.update()
+        .where(table.c.day == day, table.c.plan_id == plan.id)
+        .values({name: table.c[name] + value for name, value in amounts.items()})
+    )
+    if connection.execute(update).rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(table.insert().values(**values))
+    except IntegrityError:
+        connection.execute(update)
+
+
+def record_policy(policy, plan):
+    """Count a newly issued policy in the current transaction"""
+    _increment(
+        db.session.connection(), (policy.created_at or datetime.utcnow()).date(), plan,
+        policies_issued=1, premium_total=policy.premium, coverage_total=policy.coverage_amount
+    )
+
+
+def record_quote(quote, plan):
+    """Count a newly saved quote in the current transaction"""
+    _increment(db.session.connection(), (quote.created_at or datetime.utcnow()).date(), plan, quotes_saved=1)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _window_rows(conn, start, end):
+    """Aggregate policies and quotes created in [start, end) per (day, plan)"""
+    rows = {}
+    policy_day = db.func.date(Policy.created_at)
+    for day, plan_id, issued, premium, coverage in conn.execute(
+        db.select(
+            policy_day, Policy.plan_id, db.func.count(Policy.id),
+            db.func.sum(Policy.premium), db.func.sum(Policy.coverage_amount)
+        ).where(Policy.created_at >= start, Policy.created_at < end).group_by(policy_day, Policy.plan_id)
+    ):
+        rows[(_as_date(day), plan_id)] = {
+            'policies_issued': issued, 'premium_total': premium or 0, 'coverage_total': coverage or 0
+        }
+
+    quote_day = db.func.date(Quote.created_at)
+    for day, plan_id, saved in conn.execute(
+        db.select(quote_day, Quote.plan_id, db.func.count(Quote.id))
+        .where(Quote.created_at >= start, Quote.created_at < end).group_by(quote_day, Quote.plan_id)
+    ):
+        rows.setdefault((_as_date(day), plan_id), {})['quotes_saved'] = saved
+    return rows
+
+
+def rebuild_rollups(chunk_days=30, progress=None):
+    """
+    Backfill daily_plan_stats from policies and quotes. Each window of
+    chunk_days is replaced in its own short transaction so writers are
+    never blocked for long and the rollups stay readable throughout.
+    """
+    table = DailyPlanStats.__table__
+    bounds = []
+    for model in (Policy, Quote):
+        low, high = db.session.query(db.func.min(model.created_at), db.func.max(model.created_at)).one()
+        if low:
+            bounds.append((_as_date(low), _as_date(high)))
+    plans = {plan_id: (plan_type, provider) for plan_id, plan_type, provider in
+             db.session.query(InsurancePlan.id, InsurancePlan.type, InsurancePlan.provider)}
+    db.session.commit()
+
+    if not bounds:
+        with db.engine.begin() as conn:
+            conn.execute(table.delete())
+        return 0
+
+    first = min(low for low, _ in bounds)
+    last = max(high for _, high in bounds)
+    with db.engine.begin() as conn:
+        conn.execute(table.delete().where(db.or_(table.c.day < first, table.c.day > last)))
+
+    rows_written = 0
+    window = first
+    while window <= last:
+        window_end = window + timedelta(days=chunk_days)
+        start = datetime.combine(window, datetime.min.time())
+        end = datetime.combine(window_end, datetime.min.time())
+        with db.engine.begin() as conn:
+            # Delete first so the window is locked before it is re-aggregated
+            conn.execute(table.delete().where(table.c.day >= window, table.c.day < window_end))
+            records = []
+            for (day, plan_id), counters in _window_rows(conn, start, end).items():
+                plan_type, provider = plans.get(plan_id, ('Unknown', 'Unknown'))
+                record = {name: 0 for name in COUNTERS}
+                record.update(counters)
+                record.update(day=day, plan_id=plan_id, plan_type=plan_type, provider=provider)
+                records.append(record)
+            if records:
+                conn.execute(table.insert(), records)
+        rows_written += len(records)
+        if progress:
+            progress(window, rows_written)
+        window = window_end
+    return rows_written
+
+
+def _filtered(query, start=None, end=None):
+    """Restrict rollups to days in [start, end); datetimes are cut to their date"""
+    if start:
+        query = query.filter(DailyPlanStats.day >= _as_date(start))
+    if end:
+        query = query.filter(DailyPlanStats.day < _as_date(end))
+    return query
+
+
+def portfolio_summary(start=None, end=None):
+    """Premium, coverage and policy counts by plan type and by provider"""
+    summary = {}
+    for key, column in (('by_type', DailyPlanStats.plan_type), ('by_provider', DailyPlanStats.provider)):
+        rows = _filtered(db.session.query(
+            column,
+            db.func.sum(DailyPlanStats.policies_issued),
+            db.func.sum(DailyPlanStats.premium_total),
+            db.func.sum(DailyPlanStats.coverage_total)
+        ), start, end).group_by(column).order_by(column)
+        summary[key] = [{
+            'name': name,
+            'policies_issued': issued or 0,
+            'premium_total': round(premium or 0, 2),
+            'coverage_total': round(coverage or 0, 2)
+        } for name, issued, premium, coverage in rows]
+    return summary
+
+
+def daily_policies(start=None, end=None):
+    """Policies issued and premium written per day"""
+    rows = _filtered(db.session.query(
+        DailyPlanStats.day,
+        db.func.sum(DailyPlanStats.policies_issued),
+        db.func.sum(DailyPlanStats.premium_total)
+    ), start, end).group_by(DailyPlanStats.day).order_by(DailyPlanStats.day)
+    return [{
+        'day': day.isoformat(),
+        'policies_issued': issued or 0,
+        'premium_total': round(premium or 0, 2)
+    } for day, issued, premium in rows]
+
+
+def plan_conversion(start=None, end=None):
+    """Quote-to-policy conversion per plan"""
+    rows = _filtered(db.session.query(
+        DailyPlanStats.plan_id,
+        db.func.max(DailyPlanStats.plan_type),
+        db.func.sum(DailyPlanStats.quotes_saved),
+        db.func.sum(DailyPlanStats.policies_issued)
+    ), start, end).group_by(DailyPlanStats.plan_id).order_by(DailyPlanStats.plan_id)
+    return [{
+        'plan_id': plan_id,
+        'plan_type': plan_type,
+        'quotes_saved': quotes or 0,
+        'policies_issued': issued or 0,
+        'conversion_rate': round(issued / quotes, 4) if quotes else None
+    } for plan_id, plan_type, quotes, issued in rows]
@@ -1,25 +1,69 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from config import Config
 from models import db, User, InsurancePlan, Policy, Quote
-from recommendation_engine import InsuranceRecommendationEngine
+from recommendation_engine import InsuranceRecommendationEngine, normalize_feature
+from catalog import PlanCatalog, public_plan
+from search import PlanSearch
 from utils.pdf_generator import PolicyPDFGenerator
-from utils.security import validate_email, validate_password, generate_policy_number
+from utils.admission import AdmissionController
+from utils.cache import RecommendationCache
+from utils.compression import ResponseCompressor
+from utils.fields import FieldsetError, parse_plan_fields, select_fields, shape_items
+from utils.security import validate_email, validate_password, generate_policy_number, generate_policy_numbers
+from ingest import ingest_plans
+from export import export_stream
+from expiry import ExpirySweeper, sweep_expired_policies
+from migrations import apply_migrations, explain_hot_queries, migration_lock
+from replicas import ReadRouter, sync_sqlite_replicas
+from popularity import recompute_popularity
+from warmup import Warmup
+from idempotency import idempotent, purge_expired_keys
+from sqlalchemy.orm import configure_mappers
+from frontend_assets import build_frontend, send_frontend_file
+from werkzeug.middleware.proxy_fix import ProxyFix
+import analytics
 from datetime import datetime, timedelta
+from functools import wraps
+import click
+import io
+import numpy as np
 import os
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Trust X-Forwarded-* only from the configured number of proxies
+proxy_hops = {key: app.config[f'PROXY_FIX_{key.upper()}'] for key in ('x_for', 'x_proto', 'x_host', 'x_prefix')}
+if any(proxy_hops.values()):
+    app.wsgi_app = ProxyFix(app.wsgi_app, **proxy_hops)
+
 # Initialize extensions
 CORS(app)
 db.init_app(app)
+read_router = ReadRouter(app)
 jwt = JWTManager(app)
+compressor = ResponseCompressor(app)
+admission = AdmissionController(app)
 
 # Initialize engines
 recommendation_engine = InsuranceRecommendationEngine()
 pdf_generator = PolicyPDFGenerator()
+plan_catalog = PlanCatalog(app.config['CATALOG_SNAPSHOT_DIR'])
+plan_search = PlanSearch()
+expiry_sweeper = ExpirySweeper(
+    app,
+    interval=app.config['POLICY_EXPIRY_SWEEP_INTERVAL'],
+    batch_size=app.config['POLICY_EXPIRY_BATCH_SIZE'],
+    lock_path=app.config['POLICY_EXPIRY_LOCK_FILE']
+)
+warmup = Warmup(app)
+recommendation_cache = RecommendationCache(
+    max_bytes=app.config['RECOMMENDATION_CACHE_MAX_BYTES'],
+    salary_step=app.config['RECOMMENDATION_CACHE_SALARY_STEP'],
+    budget_step=app.config['RECOMMENDATION_CACHE_BUDGET_STEP']
+)
 
 # ============== SEED DATA FUNCTION (DEFINE FIRST) ==============
 def seed_insurance_plans():
@@ -154,20 +198,39 @@ def seed_insurance_plans():
 
 # ============== CREATE TABLES & SEED DATA ==============
 with app.app_context():
-    try:
-        # Create all tables
-        db.create_all()
-        print("✅ Database tables created successfully!")
-        
-        # Check if plans already exist
-        if InsurancePlan.query.count() == 0:
-            print("📊 Seeding initial data...")
-            seed_insurance_plans()
-        else:
-            print("✅ Database already contains data. Skipping seed.")
+    # Workers starting together set up the schema one at a time
+    with migration_lock(app.config['MIGRATION_LOCK_FILE']):
+        try:
+            # Create all tables
+            db.create_all()
+            print("✅ Database tables created successfully!")
             
+            applied = apply_migrations()
+            if applied:
+                print(f"✅ Applied schema migrations {applied}")
+            
+            # Check if plans already exist
+            if InsurancePlan.query.count() == 0:
+                print("📊 Seeding initial data...")
+                seed_insurance_plans()
+            else:
+                print("✅ Database already contains data. Skipping seed.")
+                
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error initializing database: {e}")
+    
+    # Search and catalog setup run even if the schema step failed, so a
+    # worker never serves without them
+    try:
+        if plan_search.setup():
+            print("✅ Full-text plan search enabled")
+        
+        plan_catalog.load()
+        print(f"✅ Plan catalog loaded ({len(plan_catalog)} plans)")
+        
     except Exception as e:
-        print(f"❌ Error initializing database: {e}")
+        print(f"❌ Error loading plan catalog: {e}")
 
 # ============== Authentication Routes ==============
 
@@ -335,22 +398,93 @@ def update_profile():
 
 # ============== Insurance Plan Routes ==============
 
+def parse_feature_filter(value):
+    """Accept a feature filter as a list or a comma-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [feature.strip() for feature in value if feature and feature.strip()]
+
+def is_plan_id_list(value):
+    """True for a JSON list of integer plan IDs (booleans are not IDs)"""
+    return isinstance(value, list) and all(
+        isinstance(plan_id, int) and not isinstance(plan_id, bool) for plan_id in value
+    )
+
+def plan_response_shape():
+    """Read the fields= (plan attributes) and view=normalized response options"""
+    return parse_plan_fields(request.args.get('fields')), request.args.get('view') == 'normalized'
+
+def shaped_response(key, items, fields, normalized, **extra):
+    """Build a list response, adding the side plans map in normalized view"""
+    items, plans = shape_items(items, fields, normalized)
+    body = {key: items, **extra}
+    if plans is not None:
+        body['plans'] = plans
+    return body
+
+def with_catalog_plans(rows):
+    """Serialize policies or quotes, taking each plan body from the catalog snapshot"""
+    plan_catalog.refresh()
+    plans = plan_catalog.get_many({row.plan_id for row in rows})
+    items = []
+    for row in rows:
+        item = row.to_dict(include_plan=False)
+        plan = plans.get(item.pop('plan_id'))
+        item['plan'] = public_plan(plan) if plan else row.plan.to_dict()
+        items.append(item)
+    return items
+
 @app.route('/api/plans', methods=['GET'])
 def get_plans():
-    """Get all insurance plans"""
+    """Get all insurance plans, optionally constrained by type and features"""
     try:
         plan_type = request.args.get('type')
+        must_have = parse_feature_filter(','.join(request.args.getlist('must_have')))
+        exclude = parse_feature_filter(','.join(request.args.getlist('exclude')))
         
-        query = InsurancePlan.query
-        if plan_type:
-            query = query.filter_by(type=plan_type)
+        fields = parse_plan_fields(request.args.get('fields'))
         
-        plans = query.all()
+        plan_catalog.refresh()
+        plans = plan_catalog.filter(plan_type, must_have, exclude)
         
         return jsonify({
-            'plans': [plan.to_dict() for plan in plans]
+            'plans': [select_fields(public_plan(plan), fields) for plan in plans]
         }), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/plans/search', methods=['GET'])
+def search_plans():
+    """Full-text search over plan name, provider, description and features"""
+    try:
+        query = request.args.get('q', '').strip()
+        plan_type = request.args.get('type')
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        fields, normalized = plan_response_shape()
+        plan_catalog.refresh()
+        results = []
+        for plan_id, score in plan_search.search(query, plan_type, limit):
+            plan = plan_catalog.get(plan_id)
+            if plan:
+                results.append({'plan': public_plan(plan), 'score': score})
+        
+        return jsonify(shaped_response(
+            'results', results, fields, normalized,
+            query=query,
+            search_backend='fts5' if plan_search.fts_enabled else 'like'
+        )), 200
+        
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -358,13 +492,38 @@ def get_plans():
 def get_plan(plan_id):
     """Get specific insurance plan"""
     try:
+        fields = parse_plan_fields(request.args.get('fields'))
         plan = InsurancePlan.query.get(plan_id)
         
         if not plan:
             return jsonify({'error': 'Plan not found'}), 404
         
-        return jsonify({'plan': plan.to_dict()}), 200
+        return jsonify({'plan': select_fields(plan.to_dict(), fields)}), 200
+        
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/plans/<int:plan_id>/similar', methods=['GET'])
+def get_similar_plans(plan_id):
+    """Get plans similar to a specific plan from the precomputed index"""
+    try:
+        plan_catalog.refresh()
+        
+        if not plan_catalog.get(plan_id):
+            return jsonify({'error': 'Plan not found'}), 404
+        
+        limit = min(max(request.args.get('limit', 5, type=int), 1), 100)
+        fields, normalized = plan_response_shape()
+        
+        return jsonify(shaped_response(
+            'similar', plan_catalog.similar_plans(plan_id, limit), fields, normalized,
+            plan_id=plan_id
+        )), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -383,29 +542,44 @@ def get_recommendations():
         
         data = request.get_json()
         
-        user_data = {
+        user_data = recommendation_cache.canonical_profile({
             'age': data.get('age', user.age or 30),
             'salary': data.get('salary', user.salary or 50000),
             'budget': data.get('budget'),
             'insurance_type': data.get('insurance_type')
-        }
-        
-        # Get all available plans
-        plans = InsurancePlan.query.all()
-        plans_data = [plan.to_dict() for plan in plans]
-        
-        # Get recommendations
-        recommendations = recommendation_engine.get_recommendations(
-            user_data, 
-            plans_data, 
-            top_n=data.get('top_n', 5)
-        )
-        
-        return jsonify({
-            'recommendations': recommendations,
-            'user_profile': user_data
-        }), 200
-        
+        })
+        must_have = [normalize_feature(f) for f in parse_feature_filter(data.get('must_have'))]
+        exclude = [normalize_feature(f) for f in parse_feature_filter(data.get('exclude'))]
+        top_n = data.get('top_n', 5)
+        fields, normalized = plan_response_shape()
+        
+        plan_catalog.refresh()
+        catalog = plan_catalog.current()
+        cache_key = recommendation_cache.make_key(user_data, top_n, must_have, exclude)
+        recommendations = recommendation_cache.get(cache_key, catalog.version)
+        
+        if recommendations is None:
+            # Narrow the catalog with the index before any scoring
+            rows = catalog.filter_rows(user_data['insurance_type'], must_have, exclude)
+            
+            # Get recommendations
+            recommendations = recommendation_engine.get_recommendations_columnar(
+                user_data, 
+                catalog.store, 
+                rows, 
+                top_n=top_n
+            )
+            for recommendation in recommendations:
+                recommendation['plan'] = public_plan(recommendation['plan'])
+            recommendation_cache.put(cache_key, catalog.version, recommendations)
+        
+        return jsonify(shaped_response(
+            'recommendations', recommendations, fields, normalized,
+            user_profile=user_data
+        )), 200
+        
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -443,32 +617,145 @@ def estimate_premium():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_sweep_axis(value, name, max_points):
+    """
+    Read a sweep axis given as a number, a list of numbers or a
+    {"min", "max", "step"} range; raises ValueError on bad input
+    """
+    if isinstance(value, dict):
+        try:
+            low, high, step = float(value['min']), float(value['max']), float(value.get('step', 1))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{name} range needs numeric min, max and step")
+        if step <= 0 or high < low:
+            raise ValueError(f"{name} range needs min <= max and a positive step")
+        if (high - low) / step + 1 > max_points:
+            raise ValueError(f"{name} range has more than {max_points} points")
+        values = np.arange(low, high + step / 2, step)
+    else:
+        values = value if isinstance(value, list) else [value]
+        if not values or len(values) > max_points:
+            raise ValueError(f"{name} needs between 1 and {max_points} values")
+        try:
+            values = np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} values must be numbers")
+        if values.ndim != 1:
+            raise ValueError(f"{name} values must be a flat list of numbers")
+    if not np.all(np.isfinite(values)) or np.any(values < 0):
+        raise ValueError(f"{name} values must be non-negative numbers")
+    return np.round(values, 2)
+
+@app.route('/api/premium-estimate/sweep', methods=['POST'])
+def premium_sweep():
+    """Premium curves for one or more plans over a grid of ages and salaries"""
+    try:
+        data = request.get_json() or {}
+        
+        plan_ids = data.get('plan_ids') or ([data['plan_id']] if data.get('plan_id') else [])
+        if not plan_ids or data.get('age') is None or data.get('salary') is None:
+            return jsonify({'error': 'plan_id (or plan_ids), age and salary are required'}), 400
+        if not is_plan_id_list(plan_ids):
+            return jsonify({'error': 'plan_id must be an integer and plan_ids a list of integer plan IDs'}), 400
+        
+        if len(plan_ids) > app.config['PREMIUM_SWEEP_MAX_PLANS']:
+            return jsonify({'error': f"At most {app.config['PREMIUM_SWEEP_MAX_PLANS']} plans can be swept"}), 400
+        
+        max_points = app.config['PREMIUM_SWEEP_MAX_POINTS']
+        try:
+            ages = parse_sweep_axis(data['age'], 'age', max_points)
+            salaries = parse_sweep_axis(data['salary'], 'salary', max_points)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if len(plan_ids) * len(ages) * len(salaries) > max_points:
+            return jsonify({'error': f"A sweep can price at most {max_points} points"}), 400
+        
+        plan_catalog.refresh()
+        plans_by_id = plan_catalog.get_many(plan_ids)
+        missing = [plan_id for plan_id in plan_ids if plan_id not in plans_by_id]
+        if missing:
+            return jsonify({'error': f"Plans not found: {missing}"}), 404
+        
+        plans = [plans_by_id[plan_id] for plan_id in plan_ids]
+        grid = recommendation_engine.calculate_premium_grid(plans, ages, salaries)
+        
+        return jsonify({
+            'ages': ages.tolist(),
+            'salaries': salaries.tolist(),
+            'curves': [{
+                'plan_id': plan['id'],
+                'name': plan['name'],
+                'type': plan['type'],
+                # premiums[i][j] is the annual premium at ages[i], salaries[j]
+                'premiums': premiums.tolist()
+            } for plan, premiums in zip(plans, grid)]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/compare', methods=['POST'])
 @jwt_required()
 def compare_plans():
-    """Compare multiple insurance plans"""
+    """Compare multiple insurance plans, optionally across several user profiles"""
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
         
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
         data = request.get_json()
         plan_ids = data.get('plan_ids', [])
+        profiles = data.get('profiles')
         
         if not plan_ids or len(plan_ids) < 2:
             return jsonify({'error': 'At least 2 plans required for comparison'}), 400
         
-        plans = InsurancePlan.query.all()
-        plans_data = [plan.to_dict() for plan in plans]
+        if len(plan_ids) > app.config['COMPARE_MAX_PLANS']:
+            return jsonify({'error': f"At most {app.config['COMPARE_MAX_PLANS']} plans can be compared"}), 400
         
         user_data = {
             'age': user.age or 30,
             'salary': user.salary or 50000
         }
         
-        comparison = recommendation_engine.compare_plans(plan_ids, plans_data, user_data)
+        fields, normalized = plan_response_shape()
         
-        return jsonify({'comparison': comparison}), 200
+        if profiles is not None:
+            if not profiles or len(profiles) > app.config['COMPARE_MAX_PROFILES']:
+                return jsonify({'error': f"Between 1 and {app.config['COMPARE_MAX_PROFILES']} profiles are required"}), 400
+            profiles = [{
+                'age': profile.get('age', user_data['age']),
+                'salary': profile.get('salary', user_data['salary'])
+            } for profile in profiles]
         
+        # Only the requested plans are touched, through the catalog's id index
+        plan_catalog.refresh()
+        grids = recommendation_engine.compare_plans_for_profiles(
+            plan_ids, plan_catalog.get_many(plan_ids), profiles or [user_data]
+        )
+        for comparison in grids:
+            for entry in comparison:
+                entry['plan'] = public_plan(entry['plan'])
+        
+        if profiles is None:
+            return jsonify(shaped_response('comparison', grids[0], fields, normalized)), 200
+        
+        plans = {} if normalized else None
+        comparisons = []
+        for profile, comparison in zip(profiles, grids):
+            comparison, profile_plans = shape_items(comparison, fields, normalized)
+            if normalized:
+                plans.update(profile_plans)
+            comparisons.append({'profile': profile, 'comparison': comparison})
+        body = {'comparisons': comparisons}
+        if normalized:
+            body['plans'] = plans
+        return jsonify(body), 200
+        
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -480,17 +767,21 @@ def get_user_policies():
     """Get all policies for logged-in user"""
     try:
         user_id = get_jwt_identity()
-        policies = Policy.query.filter_by(user_id=user_id).all()
+        fields, normalized = plan_response_shape()
+        policies = Policy.query.filter_by(user_id=user_id).order_by(Policy.created_at.desc()).all()
         
-        return jsonify({
-            'policies': [policy.to_dict() for policy in policies]
-        }), 200
+        return jsonify(shaped_response(
+            'policies', with_catalog_plans(policies), fields, normalized
+        )), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/policies', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_policy():
     """Create a new policy"""
     try:
@@ -529,6 +820,8 @@ def create_policy():
         )
         
         db.session.add(policy)
+        db.session.flush()
+        analytics.record_policy(policy, plan)
         db.session.commit()
         
         # Generate PDF
@@ -550,6 +843,97 @@ def create_policy():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/policies/bulk', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_policies_bulk():
+    """Buy several plans at once: one plan query, one pricing pass, one transaction"""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        data = request.get_json() or {}
+        plan_ids = data.get('plan_ids') or []
+        combined_pdf = bool(data.get('combined_pdf'))
+        
+        if not is_plan_id_list(plan_ids):
+            return jsonify({'error': 'plan_ids must be a list of integer plan IDs'}), 400
+        if not plan_ids or len(plan_ids) > app.config['POLICY_BULK_MAX_PLANS']:
+            return jsonify({'error': f"Between 1 and {app.config['POLICY_BULK_MAX_PLANS']} plan IDs are required"}), 400
+        if len(set(plan_ids)) != len(plan_ids):
+            return jsonify({'error': 'Each plan can only be bought once per bundle'}), 400
+        
+        plans_by_id = {plan.id: plan for plan in InsurancePlan.query.filter(InsurancePlan.id.in_(plan_ids))}
+        missing = [plan_id for plan_id in plan_ids if plan_id not in plans_by_id]
+        if missing:
+            return jsonify({'error': f"Plans not found: {missing}"}), 404
+        plans = [plans_by_id[plan_id] for plan_id in plan_ids]
+        
+        premiums = recommendation_engine.calculate_premiums(
+            [plan.base_premium for plan in plans],
+            user.age or 30,
+            user.salary or 50000,
+            [plan.coverage_amount for plan in plans],
+            [plan.type for plan in plans]
+        )
+        
+        # Pre-allocate the numbers, re-drawing any that are already taken
+        numbers = generate_policy_numbers(len(plans))
+        taken = {number for (number,) in db.session.query(Policy.policy_number)
+                 .filter(Policy.policy_number.in_(numbers))}
+        if taken:
+            numbers = [n for n in numbers if n not in taken]
+            numbers += generate_policy_numbers(len(plans) - len(numbers), taken | set(numbers))
+        
+        start_date = datetime.utcnow()
+        policies = [Policy(
+            user_id=user_id,
+            plan_id=plan.id,
+            policy_number=number,
+            premium=float(premium),
+            coverage_amount=plan.coverage_amount,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=365),
+            status='active'
+        ) for plan, premium, number in zip(plans, premiums, numbers)]
+        
+        db.session.add_all(policies)
+        db.session.flush()
+        for policy, plan in zip(policies, plans):
+            analytics.record_policy(policy, plan)
+        db.session.commit()
+        
+        # Render every certificate in one pass, then store the paths in one commit
+        bundle_pdf = None
+        try:
+            policies_data = [policy.to_dict() for policy in policies]
+            user_data = user.to_dict()
+            if combined_pdf:
+                bundle_pdf = pdf_generator.generate_bundle_document(policies_data, user_data)
+                for policy in policies:
+                    policy.pdf_path = bundle_pdf
+            else:
+                for policy, policy_data in zip(policies, policies_data):
+                    policy.pdf_path = pdf_generator.generate_policy_document(policy_data, user_data)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"PDF generation error: {e}")
+        
+        return jsonify({
+            'message': f'{len(policies)} policies created successfully',
+            'policies': [policy.to_dict() for policy in policies],
+            'total_premium': round(float(premiums.sum()), 2),
+            'combined_pdf': bundle_pdf is not None
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/policies/<int:policy_id>/download', methods=['GET'])
 @jwt_required()
 def download_policy(policy_id):
@@ -573,6 +957,7 @@ def download_policy(policy_id):
 
 @app.route('/api/quotes', methods=['POST'])
 @jwt_required()
+@idempotent
 def save_quote():
     """Save a quote for later"""
     try:
@@ -597,6 +982,21 @@ def save_quote():
             plan.type
         )
         
+        # A retried or repeated save of an unchanged quote returns the saved one
+        if app.config['QUOTE_REUSE_WINDOW']:
+            existing = Quote.query.filter_by(
+                user_id=user_id, plan_id=plan.id, user_age=user.age,
+                user_salary=user.salary, estimated_premium=premium
+            ).filter(
+                Quote.created_at >= datetime.utcnow() - timedelta(seconds=app.config['QUOTE_REUSE_WINDOW'])
+            ).order_by(Quote.created_at.desc()).first()
+            if existing:
+                return jsonify({
+                    'message': 'Quote already saved',
+                    'quote': existing.to_dict(),
+                    'reused': True
+                }), 200
+        
         quote = Quote(
             user_id=user_id,
             plan_id=plan_id,
@@ -606,6 +1006,8 @@ def save_quote():
         )
         
         db.session.add(quote)
+        db.session.flush()
+        analytics.record_quote(quote, plan)
         db.session.commit()
         
         return jsonify({
@@ -623,12 +1025,15 @@ def get_quotes():
     """Get all saved quotes for user"""
     try:
         user_id = get_jwt_identity()
+        fields, normalized = plan_response_shape()
         quotes = Quote.query.filter_by(user_id=user_id).order_by(Quote.created_at.desc()).all()
         
-        return jsonify({
-            'quotes': [quote.to_dict() for quote in quotes]
-        }), 200
+        return jsonify(shaped_response(
+            'quotes', with_catalog_plans(quotes), fields, normalized
+        )), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -658,6 +1063,111 @@ def get_dashboard_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ============== Admin Routes ==============
+
+def admin_required(f):
+    """Require a JWT belonging to one of the configured admin emails"""
+    @wraps(f)
+    @jwt_required()
+    def decorated(*args, **kwargs):
+        user = User.query.get(get_jwt_identity())
+        if not user or user.email not in app.config['ADMIN_EMAILS']:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+def parse_date_arg(value):
+    return datetime.fromisoformat(value) if value else None
+
+@app.route('/api/admin/export/<kind>', methods=['GET'])
+@admin_required
+def export_data(kind):
+    """Stream policies or quotes joined with their plans as CSV or JSONL"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        
+        try:
+            start = parse_date_arg(request.args.get('start'))
+            end = parse_date_arg(request.args.get('end'))
+        except ValueError:
+            return jsonify({'error': 'Dates must be in ISO format'}), 400
+        
+        if kind not in ('policies', 'quotes') or fmt not in ('csv', 'jsonl'):
+            return jsonify({'error': 'Unknown export or format'}), 400
+        
+        chunks = export_stream(kind, fmt, gzip, start, end, app.config['EXPORT_BATCH_SIZE'])
+        filename = f"{kind}.{fmt}" + ('.gz' if gzip else '')
+        mimetype = 'application/gzip' if gzip else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============== Metrics ==============
+
+@app.route('/api/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    """Runtime counters for caches and indexes (admins only)"""
+    catalog = plan_catalog.current()
+    return jsonify({
+        'recommendation_cache': recommendation_cache.stats(),
+        'compression': compressor.stats(),
+        'admission': admission.stats(),
+        'read_routing': read_router.stats(),
+        'catalog': {
+            'version': catalog.version,
+            'plans': len(catalog)
+        }
+    }), 200
+
+# ============== Portfolio Analytics Routes ==============
+
+@app.route('/api/analytics/summary', methods=['GET'])
+@admin_required
+def analytics_summary():
+    """Premium and coverage by plan type and provider, from the rollups"""
+    try:
+        start = parse_date_arg(request.args.get('start'))
+        end = parse_date_arg(request.args.get('end'))
+        return jsonify(analytics.portfolio_summary(start, end)), 200
+    except ValueError:
+        return jsonify({'error': 'Dates must be in ISO format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/daily', methods=['GET'])
+@admin_required
+def analytics_daily():
+    """Policies issued per day, from the rollups"""
+    try:
+        start = parse_date_arg(request.args.get('start'))
+        end = parse_date_arg(request.args.get('end'))
+        return jsonify({'days': analytics.daily_policies(start, end)}), 200
+    except ValueError:
+        return jsonify({'error': 'Dates must be in ISO format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/conversion', methods=['GET'])
+@admin_required
+def analytics_conversion():
+    """Quote-to-policy conversion per plan, from the rollups"""
+    try:
+        start = parse_date_arg(request.args.get('start'))
+        end = parse_date_arg(request.args.get('end'))
+        return jsonify({'plans': analytics.plan_conversion(start, end)}), 200
+    except ValueError:
+        return jsonify({'error': 'Dates must be in ISO format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============== Health Check ==============
 
 @app.route('/api/health', methods=['GET'])
@@ -669,6 +1179,56 @@ def health_check():
         'version': '1.0.0'
     }), 200
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 503 until this process has finished warming up, and for
+    as long as a critical step (database, catalog) keeps failing
+    """
+    status = warmup.status()
+    if not warmup.ready:
+        return jsonify(status), 503, {'Retry-After': '1'}
+    return jsonify(status), 200
+
+# ============== Warm-up Steps ==============
+
+WARMUP_PROFILE = {'age': 35, 'salary': 60000, 'budget': None, 'insurance_type': None}
+
+@warmup.add_step('database', critical=True)
+def warm_database():
+    """Configure the ORM mappers and open a pooled connection"""
+    configure_mappers()
+    db.session.execute(db.text('SELECT 1'))
+    User.query.first()
+
+@warmup.add_step('catalog', critical=True)
+def warm_catalog():
+    plan_catalog.load()
+
+@warmup.add_step('recommendations')
+def warm_recommendations():
+    """Run a sample recommendation, plan search and similarity lookup"""
+    catalog = plan_catalog.current()
+    recommendations = recommendation_engine.get_recommendations_columnar(
+        WARMUP_PROFILE, catalog.store, catalog.filter_rows(), top_n=5
+    )
+    plan_search.search('health')
+    if recommendations:
+        catalog.similar_plans(recommendations[0]['plan']['id'])
+
+@warmup.add_step('pdf')
+def warm_pdf():
+    """Render a throwaway certificate in memory to load ReportLab fonts and styles"""
+    catalog = plan_catalog.current()
+    sample_plan = catalog.store.record(0) if len(catalog) else {}
+    pdf_generator.generate_policy_document({
+        'policy_number': 'WARMUP',
+        'status': 'active',
+        'premium': 1200.0,
+        'coverage_amount': sample_plan.get('coverage_amount', 100000),
+        'plan': sample_plan
+    }, {'full_name': 'Warm Up', 'email': 'warmup@example.com', 'age': 35}, output=io.BytesIO())
+
 @app.route('/')
 def index():
     """Root endpoint"""
@@ -677,11 +1237,174 @@ def index():
         'version': '1.0.0',
         'endpoints': {
             'health': '/api/health',
+            'ready': '/api/ready',
             'plans': '/api/plans',
-            'auth': '/api/auth/login'
+            'auth': '/api/auth/login',
+            'frontend': '/app/'
         }
     }), 200
 
+# ============== Frontend ==============
+
+@app.route('/app/')
+@app.route('/app/<path:filename>')
+def frontend(filename='index.html'):
+    """Serve the built frontend; hashed assets are immutable and precompressed"""
+    return send_frontend_file(app.config['FRONTEND_DIST_DIR'], filename)
+
+# ============== CLI Commands ==============
+
+@app.cli.command('ingest-plans')
+@click.argument('path')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows validated and written per transaction')
+@click.option('--rejects', 'rejects_path', help='Write rejected rows to this JSONL file')
+def ingest_plans_command(path, chunk_size, rejects_path):
+    """Stream a CSV or JSONL plan catalog into the database"""
+    def progress(report):
+        stats = report.to_dict()
+        click.echo(f"  {stats['rows_read']} rows, {stats['rejected']} rejected, {stats['rows_per_second']} rows/s")
+    
+    report = ingest_plans(path, chunk_size=chunk_size, rejects_path=rejects_path, progress=progress)
+    stats = report.to_dict()
+    click.echo(
+        f"✅ Ingested {stats['rows_read']} rows in {stats['seconds']}s "
+        f"({stats['rows_per_second']} rows/s): {stats['inserted']} inserted, "
+        f"{stats['updated']} updated, {stats['rejected']} rejected, {stats['duplicates']} duplicates"
+    )
+    if stats['failed_chunks']:
+        click.echo(f"⚠️  {stats['failed_chunks']} chunk(s) were rolled back by the database; see the rejected rows")
+    # Prepare the new snapshot and similarity index now, so workers on this node only map them
+    plan_catalog.load()
+    click.echo(f"✅ Catalog snapshot v{plan_catalog.version} ready")
+
+@app.cli.command('export-data')
+@click.argument('kind', type=click.Choice(['policies', 'quotes']))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--gzip', is_flag=True, help='Gzip the output')
+@click.option('--start', type=click.DateTime(), help='Only rows created on or after this date')
+@click.option('--end', type=click.DateTime(), help='Only rows created before this date')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--output', '-o', type=click.Path(), required=True)
+def export_data_command(kind, fmt, gzip, start, end, batch_size, output):
+    """Stream policies or quotes joined with their plans to a file"""
+    size = 0
+    with open(output, 'wb') as f:
+        for chunk in export_stream(kind, fmt, gzip, start, end, batch_size):
+            f.write(chunk)
+            size += len(chunk)
+    click.echo(f"✅ Exported {kind} to {output} ({size} bytes)")
+
+@app.cli.command('rebuild-analytics')
+@click.option('--chunk-days', default=30, show_default=True, help='Days backfilled per transaction')
+def rebuild_analytics_command(chunk_days):
+    """Backfill the portfolio rollup tables from policies and quotes"""
+    rows = analytics.rebuild_rollups(
+        chunk_days=chunk_days,
+        progress=lambda window, rows: click.echo(f"  {window.isoformat()}: {rows} rollup rows")
+    )
+    click.echo(f"✅ Rebuilt analytics rollups ({rows} rows)")
+
+@app.cli.command('expire-policies')
+@click.option('--batch-size', default=500, show_default=True, help='Policies expired per transaction')
+def expire_policies_command(batch_size):
+    """Mark active policies past their end date as expired"""
+    expired = sweep_expired_policies(batch_size=batch_size)
+    click.echo(f"✅ Expired {expired} policies")
+
+@app.cli.command('build-frontend')
+def build_frontend_command():
+    """Content-hash, rewrite and precompress the frontend into FRONTEND_DIST_DIR"""
+    dist_dir = app.config['FRONTEND_DIST_DIR']
+    manifest = build_frontend(app.config['FRONTEND_SOURCE_DIR'], dist_dir)
+    for original, hashed in sorted(manifest.items()):
+        click.echo(f"  {original} -> {hashed}")
+    click.echo(f"✅ Built frontend into {dist_dir} ({len(manifest)} hashed assets)")
+
+@app.cli.command('recompute-popularity')
+@click.option('--half-life', 'half_life_days', type=float, help='Days for a purchase or quote to lose half its weight')
+@click.option('--window', 'window_days', type=int, help='Only count activity from the last N days')
+def recompute_popularity_command(half_life_days, window_days):
+    """Recompute plan popularity scores from recent policies and quotes"""
+    stats = recompute_popularity(
+        half_life_days=half_life_days or app.config['POPULARITY_HALF_LIFE_DAYS'],
+        window_days=window_days or app.config['POPULARITY_WINDOW_DAYS'],
+        policy_weight=app.config['POPULARITY_POLICY_WEIGHT'],
+        quote_weight=app.config['POPULARITY_QUOTE_WEIGHT'],
+        min_events=app.config['POPULARITY_MIN_EVENTS']
+    )
+    if stats['updated'] == 0 and stats['events'] < app.config['POPULARITY_MIN_EVENTS']:
+        click.echo(f"⚠️  Only {stats['events']} weighted events; keeping current scores")
+        return
+    click.echo(f"✅ Updated popularity for {stats['updated']} of {stats['plans']} plans "
+               f"from {stats['events']} weighted events")
+    plan_catalog.load()
+    click.echo(f"✅ Catalog snapshot v{plan_catalog.version} ready")
+
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """Delete expired Idempotency-Key records"""
+    purged = purge_expired_keys()
+    click.echo(f"✅ Purged {purged} expired idempotency keys")
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Apply pending schema migrations (indexes are built online where supported)"""
+    with migration_lock(app.config['MIGRATION_LOCK_FILE']):
+        applied = apply_migrations(progress=lambda version, description: click.echo(f"  {version}: {description}"))
+    click.echo(f"✅ Applied {len(applied)} migrations" if applied else "✅ Schema is up to date")
+
+@app.cli.command('sync-replica')
+def sync_replica_command():
+    """Copy the SQLite primary into the SQLite replicas (local replica testing)"""
+    if not read_router.keys:
+        raise click.ClickException("No DATABASE_REPLICA_URLS configured")
+    synced = sync_sqlite_replicas(db)
+    click.echo(f"✅ Synced {', '.join(synced)} from the primary")
+
+@app.cli.command('check-indexes')
+@click.option('--verbose', '-v', is_flag=True, help='Print the full query plans')
+def check_indexes_command(verbose):
+    """EXPLAIN the hot route queries and fail if any of them scans a whole table"""
+    missing = []
+    for name, (uses_index, plan) in explain_hot_queries().items():
+        click.echo(f"  {'✅' if uses_index else '❌'} {name}")
+        if verbose or not uses_index:
+            click.echo('      ' + plan.replace('\n', '\n      '))
+        if not uses_index:
+            missing.append(name)
+    if missing:
+        raise click.ClickException(f"Queries without an index: {', '.join(missing)}")
+
+@app.cli.command('check-pricing')
+@click.option('--salary-step', default=1000, show_default=True, help='Salary grid spacing')
+def check_pricing_command(salary_step):
+    """
+    Price every plan for ages 18-80 and salaries 20k-160k through the
+    vectorized paths and fail if any premium differs from calculate_premium,
+    the formula policies and quotes are charged with
+    """
+    plans = [plan.to_dict() for plan in InsurancePlan.query.order_by(InsurancePlan.id)]
+    ages = list(range(18, 81))
+    salaries = list(range(20000, 160001, salary_step))
+    grid = recommendation_engine.calculate_premium_grid(plans, ages, salaries)
+    
+    mismatches = []
+    for i, plan in enumerate(plans):
+        for j, age in enumerate(ages):
+            for k, salary in enumerate(salaries):
+                expected = recommendation_engine.calculate_premium(
+                    plan['base_premium'], age, salary, plan['coverage_amount'], plan['type']
+                )
+                if float(grid[i, j, k]) != expected:
+                    mismatches.append((plan['id'], age, salary, expected, float(grid[i, j, k])))
+    
+    checked = grid.size
+    for plan_id, age, salary, expected, got in mismatches[:10]:
+        click.echo(f"  ❌ plan {plan_id}, age {age}, salary {salary}: {got} != {expected}")
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} of {checked} premiums differ from calculate_premium")
+    click.echo(f"✅ {checked} premiums match calculate_premium")
+
 # ============== Run Application ==============
 
 if __name__ == '__main__':
@@ -693,4 +1416,6 @@ if __name__ == '__main__':
     print("🔧 Health Check: http://localhost:5000/api/health")
     print("="*50 + "\n")
     
+    expiry_sweeper.start()
+    warmup.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,391 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, InsurancePlan, CatalogState
+from recommendation_engine import PlanSimilarityIndex, normalize_feature
+from columnar import ColumnarCatalog, write_arrays, map_arrays
+from replicas import read_from_primary
+from datetime import datetime
+import hashlib
+import numpy as np
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each process builds its own files
+    fcntl = None
+
+# Derived index files saved next to each catalog snapshot
+INDEX_MAGIC = b'ORBIDX01'
+
+# Fields kept on catalog records for the engine but not part of the public plan body
+ENGINE_FIELDS = ('age_min', 'age_max', 'salary_min', 'popularity_score')
+
+
+def plan_record(plan):
+    """
+    Serialize a plan with the eligibility fields the recommendation engine needs
+    """
+    record = plan.to_dict()
+    record.update({
+        'age_min': plan.age_min,
+        'age_max': plan.age_max,
+        'salary_min': plan.salary_min,
+        'popularity_score': plan.popularity_score
+    })
+    return record
+
+
+def public_plan(record):
+    """Strip engine-only fields from a catalog record"""
+    return {k: v for k, v in record.items() if k not in ENGINE_FIELDS}
+
+
+def current_catalog_version():
+    """Return the stored catalog version (0 before the first plan write)"""
+    return current_catalog_state()[0]
+
+
+def current_catalog_state():
+    """
+    Return (version, stamp). The stamp is the time of the last bump, which
+    tells apart snapshots of a database that was recreated at the same version.
+    """
+    row = db.session.query(CatalogState.version, CatalogState.updated_at).filter_by(id=1).first()
+    if row is None:
+        return 0, 0
+    return row.version or 0, int(row.updated_at.timestamp()) if row.updated_at else 0
+
+
+def bump_catalog_version(connection):
+    """
+    Increment the catalog version so every worker reloads its snapshot
+    """
+    table = CatalogState.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        table.update()
+        .where(table.c.id == 1)
+        .values(version=table.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(id=1, version=1, updated_at=now))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_plan_write(session, flush_context):
+    touched = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, InsurancePlan) for obj in touched):
+        bump_catalog_version(session.connection())
+
+
+class BitsetIndex:
+    """
+    Inverted index from lookup tokens to bitsets of catalog rows, backed by
+    CSR postings: the rows of tokens[i] are rows[offsets[i]:offsets[i + 1]].
+    Bitsets are Python ints where bit i marks the i-th plan of the snapshot,
+    made from the postings the first time a token is looked up.
+    """
+    def __init__(self, size=0, tokens=(), offsets=None, rows=None):
+        self.size = size
+        self.tokens = {token: i for i, token in enumerate(tokens)}
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.postings = np.zeros(0, dtype=np.int32) if rows is None else rows
+        self._bitsets = {}
+
+    @classmethod
+    def from_codes(cls, tokens, codes):
+        """Index rows by a code column, where row i has token tokens[codes[i]]"""
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(tokens)), out=offsets[1:])
+        return cls(len(codes), tokens, offsets, np.argsort(codes, kind='stable').astype(np.int32))
+
+    @classmethod
+    def from_token_lists(cls, token_lists):
+        """Index rows by several tokens each, where row i has token_lists[i]"""
+        tokens = sorted(set().union(*token_lists))
+        position = {token: i for i, token in enumerate(tokens)}
+        codes = np.array([position[token] for row_tokens in token_lists for token in row_tokens], dtype=np.int64)
+        rows = np.repeat(np.arange(len(token_lists), dtype=np.int32), [len(t) for t in token_lists])
+        order = np.argsort(codes, kind='stable')
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(tokens)), out=offsets[1:])
+        return cls(len(token_lists), tokens, offsets, rows[order])
+
+    def arrays(self):
+        return {'offsets': self.offsets, 'rows': self.postings}
+
+    def _to_bitset(self, rows):
+        bits = np.zeros(self.size, dtype=bool)
+        bits[rows] = True
+        return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+    @property
+    def all(self):
+        return (1 << self.size) - 1
+
+    def get(self, token):
+        bitset = self._bitsets.get(token)
+        if bitset is None:
+            i = self.tokens.get(token)
+            if i is None:
+                return 0
+            bitset = self._to_bitset(self.postings[self.offsets[i]:self.offsets[i + 1]])
+            self._bitsets[token] = bitset
+        return bitset
+
+    def rows(self, bitset):
+        """Expand a bitset into the sorted list of row positions it marks"""
+        if not bitset:
+            return []
+        packed = np.frombuffer(bitset.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(packed, bitorder='little')[:self.size]).tolist()
+
+
+def _feature_tokens(store):
+    return [sorted({normalize_feature(f) for f in features}) for features in store.feature_lists()]
+
+
+class CatalogSnapshot:
+    """
+    One catalog version: the mapped store and the indexes built from it.
+    Snapshots are never modified once published, so a reader that takes
+    PlanCatalog.current() once sees a store and indexes that match.
+    """
+    __slots__ = ('version', 'store', 'features', 'types', 'similarity')
+
+    def __init__(self, version, store, features, types, similarity):
+        self.version = version
+        self.store = store
+        self.features = features
+        self.types = types
+        self.similarity = similarity
+
+    def __len__(self):
+        return len(self.store) if self.store else 0
+
+    def get(self, plan_id):
+        row = self.store.row_of(plan_id) if self.store else None
+        return self.store.record(row) if row is not None else None
+
+    def get_many(self, plan_ids):
+        """Return {plan_id: record} for the ids that exist"""
+        plans = {}
+        for plan_id in plan_ids:
+            plan = self.get(plan_id) if isinstance(plan_id, int) else None
+            if plan:
+                plans[plan_id] = plan
+        return plans
+
+    def filter_rows(self, plan_type=None, must_have=(), exclude=()):
+        """
+        Resolve type and feature constraints with bitset intersections and
+        return the matching snapshot rows in catalog order
+        """
+        features = self.features
+        mask = self.types.get(plan_type) if plan_type else features.all
+        for feature in must_have:
+            mask &= features.get(normalize_feature(feature))
+        for feature in exclude:
+            mask &= ~features.get(normalize_feature(feature))
+        if mask == features.all:
+            return np.arange(features.size)
+        return np.array(features.rows(mask), dtype=np.int64)
+
+    def filter(self, plan_type=None, must_have=(), exclude=()):
+        """Like filter_rows, but materialized as catalog records"""
+        return self.store.records(self.filter_rows(plan_type, must_have, exclude))
+
+    def similar_plans(self, plan_id, limit=None):
+        """
+        Return the precomputed nearest plans as [{'plan': ..., 'similarity': ...}]
+        """
+        similar = []
+        for neighbor_id, score in self.similarity.similar(plan_id, limit):
+            plan = self.get(neighbor_id)
+            if plan:
+                similar.append({'plan': public_plan(plan), 'similarity': score})
+        return similar
+
+
+class PlanCatalog:
+    """
+    Current snapshot of the insurance plan catalog and its derived indexes.
+    Plan data lives in a ColumnarCatalog file under snapshot_dir and the
+    similarity neighbourhoods in an index file next to it. Both are written
+    once per catalog version and node, by whichever process first needs them,
+    and mapped by every worker. A new version is prepared off the request
+    path and published with a single assignment, so readers keep the previous
+    snapshot until then; callers that use several parts of the catalog
+    together should take current() once.
+    """
+    def __init__(self, snapshot_dir, similarity_top_k=10):
+        self.snapshot_dir = snapshot_dir
+        self.similarity_top_k = similarity_top_k
+        self.snapshot = CatalogSnapshot(
+            None, None, BitsetIndex(), BitsetIndex(), PlanSimilarityIndex(top_k=similarity_top_k)
+        )
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._builder = None
+
+    def current(self):
+        return self.snapshot
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def store(self):
+        return self.snapshot.store
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def _paths(self, version, stamp):
+        """Snapshot and index file paths for a version of this database's catalog"""
+        database = hashlib.sha1(str(db.engine.url).encode('utf-8')).hexdigest()[:12]
+        base = os.path.join(self.snapshot_dir, f'catalog-{database}-v{version}-{stamp}')
+        return f'{base}.bin', f'{base}.idx'
+
+    def _remove_stale(self, path):
+        """
+        Unlink the files of older versions; workers still mapping them keep
+        their pages until they move on
+        """
+        prefix = os.path.basename(path).rsplit('-v', 1)[0] + '-v'
+        keep = os.path.basename(path).rsplit('.', 1)[0]
+        for name in os.listdir(self.snapshot_dir):
+            if name.startswith(prefix) and name.endswith(('.bin', '.idx')) and name.rsplit('.', 1)[0] != keep:
+                try:
+                    os.remove(os.path.join(self.snapshot_dir, name))
+                except OSError:
+                    pass
+
+    def _changed_rows(self, previous, store):
+        """
+        Flag the rows of store that are new since previous or whose
+        similarity inputs (type, coverage, premium, rating, features)
+        differ, comparing the two snapshots column by column. Edits to
+        anything else, such as popularity scores, keep every neighbourhood.
+        """
+        changed = np.ones(len(store), dtype=bool)
+        if previous is None or not len(previous):
+            return changed
+        rows = np.minimum(np.searchsorted(previous.ids, store.ids), len(previous) - 1)
+        present = previous.ids[rows] == store.ids
+        old_rows, new_rows = rows[present], np.flatnonzero(present)
+        differs = previous.type_names_of(old_rows) != store.type_names_of(new_rows)
+        for name in PlanSimilarityIndex.NUMERIC_INPUTS:
+            old, new = previous.column(name)[old_rows], store.column(name)[new_rows]
+            differs |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+        for name in PlanSimilarityIndex.STRING_INPUTS:
+            differs |= previous.strings_differ(name, old_rows, store, new_rows)
+        changed[new_rows] = differs
+        return changed
+
+    def _build(self, version, stamp, previous):
+        """
+        Write the snapshot and index files for version unless another
+        process already has. Builds are serialized across processes by a
+        lock file, so a node prepares each version once however many
+        workers notice it; the similarity index is updated incrementally
+        from previous (the snapshot this process serves) when possible.
+        """
+        store_path, index_path = self._paths(version, stamp)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with open(os.path.join(self.snapshot_dir, 'build.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if os.path.exists(index_path):
+                return
+            if not os.path.exists(store_path):
+                records = [plan_record(p) for p in InsurancePlan.query.order_by(InsurancePlan.id)]
+                ColumnarCatalog.write(store_path, records, version)
+            store = ColumnarCatalog.open(store_path)
+            similarity = PlanSimilarityIndex(top_k=self.similarity_top_k)
+            if previous.store is not None and previous.similarity.top_k == similarity.top_k:
+                similarity.update(previous.similarity, store, self._changed_rows(previous.store, store))
+            else:
+                similarity.build(store)
+            features = BitsetIndex.from_token_lists(_feature_tokens(store))
+            arrays = dict(similarity.arrays())
+            arrays.update({f'feature_{name}': array for name, array in features.arrays().items()})
+            write_arrays(index_path, INDEX_MAGIC, arrays, {
+                'similarity': similarity.meta(), 'features': list(features.tokens)
+            })
+            self._remove_stale(store_path)
+
+    def _open(self, version, stamp):
+        """
+        Map the files for version. Every index is a view onto the mapped
+        arrays, so opening a snapshot costs no per-plan work.
+        """
+        store_path, index_path = self._paths(version, stamp)
+        store = ColumnarCatalog.open(store_path)
+        _, header, arrays = map_arrays(index_path, INDEX_MAGIC)
+        similarity = PlanSimilarityIndex.from_arrays(header['similarity'], arrays)
+        features = BitsetIndex(len(store), header['features'], arrays['feature_offsets'], arrays['feature_rows'])
+        types = BitsetIndex.from_codes(store.type_names, store.type_codes)
+        return CatalogSnapshot(version, store, features, types, similarity)
+
+    def _publish(self, version, stamp):
+        """Build (if needed) and map the files for version, then swap the snapshot in"""
+        with self._publish_lock:
+            current = self.snapshot
+            if version == current.version:
+                return
+            self._build(version, stamp, current)
+            self.snapshot = self._open(version, stamp)
+
+    def _publish_in_background(self, app, version, stamp):
+        try:
+            with app.app_context():
+                self._publish(version, stamp)
+        except Exception as e:
+            print(f"Catalog refresh error: {e}")
+
+    def load(self):
+        """Publish the snapshot for the current catalog version before returning"""
+        self.refresh(wait=True)
+
+    def refresh(self, wait=False):
+        """
+        Publish the snapshot for the current catalog version if it changed.
+        Unless wait is set, the new version is built and mapped on a
+        background thread and readers keep the previous snapshot meanwhile.
+        """
+        with read_from_primary():
+            version, stamp = current_catalog_state()
+        if version == self.snapshot.version:
+            return
+        if wait:
+            self._publish(version, stamp)
+            return
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return
+            self._builder = threading.Thread(
+                target=self._publish_in_background,
+                args=(current_app._get_current_object(), version, stamp),
+                name='catalog-builder', daemon=True
+            )
+            self._builder.start()
+
+    def get(self, plan_id):
+        return self.snapshot.get(plan_id)
+
+    def get_many(self, plan_ids):
+        """Return {plan_id: record} for the ids that exist"""
+        return self.snapshot.get_many(plan_ids)
+
+    def filter_rows(self, plan_type=None, must_have=(), exclude=()):
+        return self.snapshot.filter_rows(plan_type, must_have, exclude)
+
+    def filter(self, plan_type=None, must_have=(), exclude=()):
+        return self.snapshot.filter(plan_type, must_have, exclude)
+
+    def similar_plans(self, plan_id, limit=None):
+        return self.snapshot.similar_plans(plan_id, limit)
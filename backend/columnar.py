@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b'ORBCAT01'
+ALIGN = 8
+
+# Fixed-width numeric columns; NaN stands for NULL
+NUMERIC_COLUMNS = (
+    'coverage_amount', 'base_premium', 'age_min', 'age_max',
+    'salary_min', 'popularity_score', 'rating',
+)
+INTEGER_COLUMNS = ('age_min', 'age_max')
+# Variable-width columns stored as an offset array plus a UTF-8 blob
+STRING_COLUMNS = ('name', 'provider', 'description', 'features')
+# Rows whose string bytes are compared at once by strings_differ
+COMPARE_CHUNK_ROWS = 16384
+
+
+def _aligned(size):
+    return -(-size // ALIGN) * ALIGN
+
+
+def write_arrays(path, magic, arrays, meta):
+    """
+    Write named 1-D numpy arrays and a JSON header to path: magic, header
+    length, header, then each array at an aligned offset. The file is written
+    next to its destination and renamed into place, so readers only ever see
+    complete files.
+    """
+    columns = {}
+    offset = 0
+    for name, array in arrays.items():
+        columns[name] = [array.dtype.str, offset, len(array)]
+        offset += _aligned(array.nbytes)
+    header = json.dumps(dict(meta, columns=columns)).encode('utf-8')
+    data_start = _aligned(len(magic) + 8 + len(header))
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + columns[name][1])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def map_arrays(path, magic):
+    """
+    Map a file written by write_arrays. Returns (buffer, header, arrays);
+    the arrays are read-only views onto the shared mapping.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(magic)] != magic:
+        raise ValueError(f'{path} is not a {magic.decode()} file')
+    (header_length,) = struct.unpack_from('<Q', buffer, len(magic))
+    start = len(magic) + 8
+    header = json.loads(bytes(buffer[start:start + header_length]))
+    data_start = _aligned(start + header_length)
+    arrays = {
+        name: np.frombuffer(buffer, dtype=dtype, count=length, offset=data_start + offset)
+        for name, (dtype, offset, length) in header.pop('columns').items()
+    }
+    return buffer, header, arrays
+
+
+class ColumnarCatalog:
+    """
+    Read-only columnar snapshot of the plan catalog in a memory-mapped file.
+    Numeric columns and string offsets are numpy views straight onto the
+    mapping, so every process that opens the same file shares one copy.
+    """
+    def __init__(self, path, buffer, header, columns):
+        self.path = path
+        self.version = header['version']
+        self.count = header['count']
+        self.type_names = header['types']
+        self._buffer = buffer
+        self._columns = columns
+        self.ids = self._columns['id']
+        self.type_codes = self._columns['type']
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name):
+        return self._columns[name]
+
+    @classmethod
+    def write(cls, path, plans, version):
+        """
+        Serialize catalog records (sorted by id) to path, atomically
+        """
+        types = sorted({p['type'] for p in plans})
+        type_codes = {t: i for i, t in enumerate(types)}
+        arrays = {
+            'id': np.array([p['id'] for p in plans], dtype=np.int64),
+            'type': np.array([type_codes[p['type']] for p in plans], dtype=np.int16),
+        }
+        for name in NUMERIC_COLUMNS:
+            arrays[name] = np.array(
+                [np.nan if p.get(name) is None else p[name] for p in plans], dtype=np.float64
+            )
+        for name in STRING_COLUMNS:
+            encoded = []
+            nulls = np.zeros(len(plans), dtype=np.uint8)
+            for i, plan in enumerate(plans):
+                value = plan.get(name)
+                if value is None:
+                    nulls[i] = 1
+                    value = ''
+                elif name == 'features':
+                    value = json.dumps(value)
+                encoded.append(value.encode('utf-8'))
+            offsets = np.zeros(len(plans) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            arrays[f'{name}_offsets'] = offsets
+            arrays[f'{name}_nulls'] = nulls
+            arrays[f'{name}_blob'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        write_arrays(path, MAGIC, arrays, {'version': version, 'count': len(plans), 'types': types})
+
+    @classmethod
+    def open(cls, path):
+        return cls(path, *map_arrays(path, MAGIC))
+
+    def row_of(self, plan_id):
+        """Row position of plan_id, found by binary search over the id column"""
+        row = int(np.searchsorted(self.ids, plan_id))
+        if row < self.count and self.ids[row] == plan_id:
+            return row
+        return None
+
+    def _string(self, name, row):
+        if self._columns[f'{name}_nulls'][row]:
+            return None
+        offsets = self._columns[f'{name}_offsets']
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return self._columns[f'{name}_blob'][start:end].tobytes().decode('utf-8')
+
+    def _number(self, name, row):
+        value = float(self._columns[name][row])
+        if value != value:
+            return None
+        return int(value) if name in INTEGER_COLUMNS else value
+
+    def record(self, row):
+        """Materialize one row as a catalog record dict"""
+        features = self._string('features', row)
+        age_min, age_max = self._number('age_min', row), self._number('age_max', row)
+        return {
+            'id': int(self.ids[row]),
+            'name': self._string('name', row),
+            'provider': self._string('provider', row),
+            'type': self.type_names[self.type_codes[row]],
+            'coverage_amount': self._number('coverage_amount', row),
+            'base_premium': self._number('base_premium', row),
+            'description': self._string('description', row),
+            'features': json.loads(features) if features is not None else None,
+            'age_range': [age_min, age_max],
+            'rating': self._number('rating', row),
+            'age_min': age_min,
+            'age_max': age_max,
+            'salary_min': self._number('salary_min', row),
+            'popularity_score': self._number('popularity_score', row),
+        }
+
+    def feature_lists(self):
+        """The features list of every row, parsed straight from the blob column"""
+        return [json.loads(self._string('features', row) or 'null') or [] for row in range(self.count)]
+
+    def records(self, rows=None):
+        rows = range(self.count) if rows is None else rows
+        return [self.record(int(row)) for row in rows]
+
+    def type_code(self, plan_type):
+        try:
+            return self.type_names.index(plan_type)
+        except ValueError:
+            return None
+
+    def type_names_of(self, rows):
+        """Type names of rows, comparable across snapshots whose type codes differ"""
+        return np.array(self.type_names, dtype=object)[self.type_codes[rows]]
+
+    def strings_differ(self, name, rows, other, other_rows):
+        """
+        Flag each pair (rows[i], other_rows[i]) whose string column name
+        differs between this snapshot and other, comparing blob bytes directly
+        """
+        nulls = self._columns[f'{name}_nulls'][rows]
+        offsets = self._columns[f'{name}_offsets']
+        starts, lengths = offsets[rows], offsets[rows + 1] - offsets[rows]
+        other_offsets = other._columns[f'{name}_offsets']
+        other_starts = other_offsets[other_rows]
+        differs = (nulls != other._columns[f'{name}_nulls'][other_rows]) | \
+            (lengths != other_offsets[other_rows + 1] - other_starts)
+        blob, other_blob = self._columns[f'{name}_blob'], other._columns[f'{name}_blob']
+        candidates = np.flatnonzero(~differs & (lengths > 0))
+        for chunk_start in range(0, len(candidates), COMPARE_CHUNK_ROWS):
+            chunk = candidates[chunk_start:chunk_start + COMPARE_CHUNK_ROWS]
+            chunk_lengths = lengths[chunk]
+            begins = np.cumsum(chunk_lengths) - chunk_lengths
+            within = np.arange(int(chunk_lengths.sum())) - np.repeat(begins, chunk_lengths)
+            mismatches = blob[np.repeat(starts[chunk], chunk_lengths) + within] != \
+                other_blob[np.repeat(other_starts[chunk], chunk_lengths) + within]
+            differs[chunk] = np.add.reduceat(mismatches, begins) > 0
+        return differs
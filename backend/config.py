@@ -1,4 +1,6 @@
+from replicas import replica_binds
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -8,11 +10,26 @@ class Config:
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///orbit.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Processes starting together create the schema and migrate one at a time under this lock
+    MIGRATION_LOCK_FILE = os.environ.get(
+        'MIGRATION_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'orbit-migrations.lock')
+    )
+    
+    # Read replicas (comma-separated URLs). GET requests read from them, except for
+    # REPLICA_STICKY_SECONDS after the same user or client wrote something
+    DATABASE_REPLICA_URLS = [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    SQLALCHEMY_BINDS = replica_binds(DATABASE_REPLICA_URLS)
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_MAX_STICKY_CLIENTS = 100000
     
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-2024'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
+    # Admin Configuration
+    ADMIN_EMAILS = [e.strip() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()]
+    EXPORT_BATCH_SIZE = 1000
+    
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
@@ -23,6 +40,75 @@ class Config:
     
     # Insurance Plan Configuration
     INSURANCE_TYPES = ['Health', 'Life', 'Vehicle', 'Home', 'Travel']
+    COMPARE_MAX_PLANS = 50
+    COMPARE_MAX_PROFILES = 20
+    PREMIUM_SWEEP_MAX_PLANS = 20
+    POLICY_BULK_MAX_PLANS = 10
+    PREMIUM_SWEEP_MAX_POINTS = 20000  # plans x ages x salaries priced per sweep request
+    
+    # Plan catalog snapshots are memory-mapped by every worker; tmpfs keeps them in RAM
+    CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR') or os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'orbit-catalog'
+    )
+    
+    # Recommendation Cache Settings
+    RECOMMENDATION_CACHE_MAX_BYTES = int(os.environ.get('RECOMMENDATION_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    RECOMMENDATION_CACHE_SALARY_STEP = float(os.environ.get('RECOMMENDATION_CACHE_SALARY_STEP', 0))  # 0 = exact
+    RECOMMENDATION_CACHE_BUDGET_STEP = float(os.environ.get('RECOMMENDATION_CACHE_BUDGET_STEP', 0))  # 0 = exact
+    
+    # Response Compression Settings
+    COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are sent as-is
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5
+    COMPRESSION_CACHE_ENTRIES = 256
+    COMPRESSION_CACHEABLE_ENDPOINTS = ['get_plans', 'get_plan', 'get_similar_plans', 'search_plans']
+    
+    # Reverse proxies in front of the app (0 = none). Each count is how many proxies
+    # append to that X-Forwarded-* header; only those trusted hops are honoured, so
+    # request.remote_addr is the real client IP for rate limiting and read routing
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO', 0))
+    PROXY_FIX_X_HOST = int(os.environ.get('PROXY_FIX_X_HOST', 0))
+    PROXY_FIX_X_PREFIX = int(os.environ.get('PROXY_FIX_X_PREFIX', 0))
+    
+    # Admission Control: per-endpoint concurrency caps and per-client token buckets.
+    # concurrency = worker slots per process; queue_timeout = seconds a request may wait
+    # for a slot before a 503; rate/burst = requests per second per user (or IP) before a 429
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', '1') == '1'
+    ADMISSION_MAX_BUCKETS = 100000
+    ADMISSION_ROUTE_LIMITS = {
+        'get_recommendations': {'concurrency': 4, 'queue_timeout': 0.5, 'rate': 5, 'burst': 10},
+        'compare_plans': {'concurrency': 2, 'queue_timeout': 0.5, 'rate': 2, 'burst': 5},
+        'create_policy': {'concurrency': 2, 'queue_timeout': 1.0, 'rate': 1, 'burst': 5},
+        'create_policies_bulk': {'concurrency': 1, 'queue_timeout': 1.0, 'rate': 0.2, 'burst': 2},
+        'login': {'concurrency': 4, 'queue_timeout': 0.5, 'rate': 1, 'burst': 5},
+        'register': {'concurrency': 2, 'queue_timeout': 0.5, 'rate': 0.2, 'burst': 3},
+    }
+    
+    # Frontend build (flask build-frontend) served under /app/
+    FRONTEND_SOURCE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend'))
+    FRONTEND_DIST_DIR = os.environ.get('FRONTEND_DIST_DIR') or os.path.join(FRONTEND_SOURCE_DIR, 'dist')
+    
+    # Popularity recompute (flask recompute-popularity): time-decayed policy and quote demand
+    POPULARITY_HALF_LIFE_DAYS = 30
+    POPULARITY_WINDOW_DAYS = 180
+    POPULARITY_POLICY_WEIGHT = 1.0
+    POPULARITY_QUOTE_WEIGHT = 0.25
+    POPULARITY_MIN_EVENTS = 20  # below this much activity the seeded scores are kept
+    
+    # Idempotency-Key replay window for POST /api/policies and /api/quotes
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))  # seconds
+    IDEMPOTENCY_LOCK_TIMEOUT = 120  # seconds before an unfinished request's key can be reclaimed
+    # An identical saved quote (same plan, age, salary and premium) this recent is returned instead
+    QUOTE_REUSE_WINDOW = int(os.environ.get('QUOTE_REUSE_WINDOW', 24 * 3600))  # seconds, 0 = off
+    
+    # Policy Expiry Sweeper Settings
+    POLICY_EXPIRY_SWEEP_INTERVAL = int(os.environ.get('POLICY_EXPIRY_SWEEP_INTERVAL', 3600))  # seconds, 0 = off
+    POLICY_EXPIRY_BATCH_SIZE = 500
+    # Every process starts the sweeper; only the one holding this lock sweeps
+    POLICY_EXPIRY_LOCK_FILE = os.environ.get(
+        'POLICY_EXPIRY_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'orbit-expiry-sweeper.lock')
+    )
     
     # ML Model Settings
     MODEL_PATH = 'models/recommendation_model.pkl'
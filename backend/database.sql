@@ -66,6 +66,8 @@ CREATE TABLE IF NOT EXISTS quotes (
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_google_id ON users(google_id);
 CREATE INDEX idx_plans_type ON insurance_plans(type);
-CREATE INDEX idx_policies_user_id ON policies(user_id);
-CREATE INDEX idx_policies_status ON policies(status);
-CREATE INDEX idx_quotes_user_id ON quotes(user_id);
\ No newline at end of file
+CREATE INDEX ix_policies_status_end_date ON policies(status, end_date);
+CREATE INDEX ix_policies_user_status ON policies(user_id, status);
+CREATE INDEX ix_policies_user_created ON policies(user_id, created_at);
+CREATE INDEX ix_quotes_user_created ON quotes(user_id, created_at);
+CREATE UNIQUE INDEX ix_insurance_plans_provider_name ON insurance_plans(provider, name);
\ No newline at end of file
@@ -0,0 +1,110 @@
+from models import db, Policy
+from idempotency import purge_expired_keys
+from datetime import datetime
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every sweeper runs
+    fcntl = None
+
+LOCK_RETRY_SECONDS = 60
+
+
+def sweep_expired_policies(batch_size=500, now=None, pause=0.0):
+    """
+    Mark active policies whose end_date has passed as expired.
+    Works in batches of batch_size, each in its own short transaction, so
+    concurrent writers only ever wait for one small batch.
+    """
+    now = now or datetime.utcnow()
+    table = Policy.__table__
+    expired = 0
+    while True:
+        with db.engine.begin() as conn:
+            ids = [row.id for row in conn.execute(
+                db.select(table.c.id)
+                .where(table.c.status == 'active', table.c.end_date <= now)
+                .order_by(table.c.end_date)
+                .limit(batch_size)
+            )]
+            if ids:
+                conn.execute(
+                    table.update()
+                    .where(table.c.id.in_(ids), table.c.status == 'active')
+                    .values(status='expired')
+                )
+        expired += len(ids)
+        if len(ids) < batch_size:
+            return expired
+        if pause:
+            time.sleep(pause)
+
+
+class ExpirySweeper:
+    """
+    Background thread that runs the expiry sweep (and purges expired
+    idempotency keys) on a fixed interval.
+
+    Every server process may start one; with a lock_path only the process
+    holding an exclusive lock on that file sweeps, and the others keep
+    retrying so a new owner takes over when the current one exits (e.g. a
+    gunicorn worker recycled by max_requests). Deployments that would
+    rather schedule it externally can set the interval to 0 and run
+    `flask expire-policies` from cron.
+    """
+    def __init__(self, app, interval, batch_size=500, lock_path=None):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lock_path = lock_path
+        self.owner = False
+        self.last_run = None
+        self.last_expired = 0
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name='policy-expiry-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire(self):
+        """Take the sweeper lock without blocking; held until the process exits"""
+        if self.owner or not self.lock_path or fcntl is None:
+            self.owner = True
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f'{os.getpid()}\n')
+        lock_file.flush()
+        self._lock_file = lock_file
+        self.owner = True
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._acquire():
+                self._stop.wait(min(self.interval, LOCK_RETRY_SECONDS))
+                continue
+            try:
+                with self.app.app_context():
+                    self.last_expired = sweep_expired_policies(self.batch_size, pause=0.05)
+                    purge_expired_keys(batch_size=self.batch_size)
+                    self.last_run = datetime.utcnow()
+            except Exception as e:
+                print(f"Policy expiry sweep error: {e}")
+            self._stop.wait(self.interval)
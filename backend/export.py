@@ -0,0 +1,100 @@
+from models import db, InsurancePlan, Policy, Quote
+import csv
+import io
+import json
+import zlib
+
+PLAN_COLUMNS = [
+    InsurancePlan.name.label('plan_name'),
+    InsurancePlan.provider.label('plan_provider'),
+    InsurancePlan.type.label('plan_type'),
+    InsurancePlan.base_premium.label('plan_base_premium'),
+]
+
+EXPORTS = {
+    'policies': (Policy, [
+        Policy.id, Policy.policy_number, Policy.user_id, Policy.plan_id,
+        Policy.premium, Policy.coverage_amount, Policy.status,
+        Policy.start_date, Policy.end_date, Policy.created_at,
+    ]),
+    'quotes': (Quote, [
+        Quote.id, Quote.user_id, Quote.plan_id, Quote.estimated_premium,
+        Quote.user_age, Quote.user_salary, Quote.created_at,
+    ]),
+}
+
+
+def export_fields(kind):
+    _, columns = EXPORTS[kind]
+    return [c.key for c in columns] + [c.key for c in PLAN_COLUMNS]
+
+
+def iter_export_batches(kind, start=None, end=None, batch_size=1000):
+    """
+    Yield lists of joined row dicts, fetched from a streaming cursor so at
+    most one batch is held in memory at a time
+    """
+    model, columns = EXPORTS[kind]
+    stmt = (
+        db.select(*columns, *PLAN_COLUMNS)
+        .join(InsurancePlan, InsurancePlan.id == model.plan_id)
+        .order_by(model.id)
+    )
+    if start:
+        stmt = stmt.where(model.created_at >= start)
+    if end:
+        stmt = stmt.where(model.created_at < end)
+
+    result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.mappings().partitions(batch_size):
+        yield [dict(row) for row in partition]
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def format_csv(batches, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows({k: _value(v) for k, v in row.items()} for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_jsonl(batches):
+    for batch in batches:
+        yield ''.join(json.dumps({k: _value(v) for k, v in row.items()}) + '\n' for row in batch)
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, fmt='csv', gzip=False, start=None, end=None, batch_size=1000):
+    """
+    Return an iterator of encoded export chunks for policies or quotes
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f'Unknown export: {kind}')
+    batches = iter_export_batches(kind, start, end, batch_size)
+    if fmt == 'csv':
+        chunks = format_csv(batches, export_fields(kind))
+    elif fmt == 'jsonl':
+        chunks = format_jsonl(batches)
+    else:
+        raise ValueError(f'Unknown export format: {fmt}')
+    if gzip:
+        return gzip_stream(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
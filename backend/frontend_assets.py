@@ -0,0 +1,100 @@
+from flask import abort, request, send_file
+from utils.compression import brotli, parse_accept_encoding
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+ASSET_DIRS = ('scripts', 'styles')
+HTML_FILES = ('index.html', 'dashboard.html')
+MANIFEST = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ASSET_REFERENCE = re.compile(r'''(\b(?:src|href)=["'])((?:%s)/[^"'?#]+)(["'])''' % '|'.join(ASSET_DIRS))
+
+
+def _hashed_name(relative_path, content):
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    root, ext = os.path.splitext(relative_path)
+    return f'{root}.{digest}{ext}'
+
+
+def _write_variants(path, content):
+    """Write a file with its .gz (and .br when available) variants next to it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def build_frontend(source_dir, dist_dir):
+    """
+    Copy the frontend into dist_dir with content-hashed asset filenames,
+    rewrite the HTML to reference them, and precompress everything.
+    Returns the {original: hashed} manifest.
+    """
+    manifest = {}
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    for asset_dir in ASSET_DIRS:
+        for name in sorted(os.listdir(os.path.join(source_dir, asset_dir))):
+            relative = f'{asset_dir}/{name}'
+            with open(os.path.join(source_dir, relative), 'rb') as f:
+                content = f.read()
+            hashed = _hashed_name(relative, content)
+            manifest[relative] = hashed
+            _write_variants(os.path.join(dist_dir, hashed), content)
+
+    for name in HTML_FILES:
+        with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+            html = f.read()
+        html = ASSET_REFERENCE.sub(
+            lambda m: m.group(1) + manifest.get(m.group(2), m.group(2)) + m.group(3), html
+        )
+        _write_variants(os.path.join(dist_dir, name), html.encode('utf-8'))
+
+    with open(os.path.join(dist_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def send_frontend_file(dist_dir, filename):
+    """
+    Serve a built frontend file, picking a precompressed variant the client
+    accepts. Hashed assets are immutable; HTML is always revalidated.
+    """
+    dist_dir = os.path.realpath(dist_dir)
+    path = os.path.realpath(os.path.join(dist_dir, filename))
+    if not path.startswith(dist_dir + os.sep) or not os.path.isfile(path) or filename == MANIFEST:
+        abort(404)
+
+    accepted = parse_accept_encoding(request.headers.get('Accept-Encoding'))
+    encoding = None
+    for coding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted.get(coding, accepted.get('*', 0)) > 0 and os.path.isfile(path + suffix):
+            encoding, path = coding, path + suffix
+            break
+
+    is_html = filename.endswith('.html')
+    response = send_file(
+        path,
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        conditional=True,
+        max_age=0 if is_html else IMMUTABLE_MAX_AGE
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if is_html:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
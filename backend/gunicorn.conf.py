@@ -0,0 +1,75 @@
+"""
+Production server configuration for ORBIT.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The application is imported once in the master (preload_app) so the plan
+catalog, its similarity and feature indexes, the recommendation engine and
+the ReportLab styles are built before forking and shared copy-on-write by
+every worker. Because the code is preloaded, a HUP only restarts workers
+from the already-loaded code; deploy new code with USR2 (start a new master)
+followed by QUIT to the old one.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('ORBIT_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('ORBIT_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('ORBIT_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = os.environ.get('ORBIT_PRELOAD', '1') != '0'
+
+timeout = int(os.environ.get('ORBIT_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('ORBIT_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers periodically; jitter keeps them from restarting together
+max_requests = int(os.environ.get('ORBIT_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# Skip collections while the app loads; everything allocated here is long-lived
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before any worker forks"""
+    if preload_app:
+        from app import app, warmup
+        from models import db
+        # Warm once in the master so every worker forks ready and shares the result
+        warmup.run()
+        # Move every loaded object into the permanent generation so the
+        # collector never writes to (and un-shares) those pages in workers
+        gc.freeze()
+        gc.enable()
+        with app.app_context():
+            # Connections opened while preloading must not be shared by workers
+            for engine in db.engines.values():
+                engine.dispose()
+        server.log.info('Preloaded ORBIT app; sharing state with workers copy-on-write')
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import app
+    from models import db
+    with app.app_context():
+        # Drop the pools inherited from the master without closing their sockets
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from app import expiry_sweeper, warmup
+    if not preload_app:
+        # Each worker warms itself in the background; /api/ready answers 503 until done
+        warmup.start()
+    # Every worker starts the sweeper thread (never the master, which must stay
+    # thread- and connection-free before forking); the lock file picks the one
+    # that actually sweeps, and another takes over when that worker is recycled
+    expiry_sweeper.start()
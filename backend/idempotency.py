@@ -0,0 +1,119 @@
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+from datetime import datetime, timedelta
+from functools import wraps
+import hashlib
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 100
+
+
+def _error(message, status):
+    return jsonify({'error': message}), status
+
+
+def _claim(table, ident, request_hash, now, ttl, lock_timeout):
+    """
+    Insert an in-progress row for the key. Returns None when this request
+    owns the key, else the live row left by an earlier request. Expired
+    rows, and in-progress rows abandoned for lock_timeout, are replaced.
+    """
+    with db.engine.begin() as conn:
+        conn.execute(table.delete().where(
+            table.c.user_id == ident['user_id'], table.c.endpoint == ident['endpoint'],
+            table.c.key == ident['key'],
+            db.or_(table.c.expires_at <= now,
+                   db.and_(table.c.status_code.is_(None), table.c.created_at <= now - lock_timeout))
+        ))
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert().values(
+                    request_hash=request_hash, created_at=now, expires_at=now + ttl, **ident
+                ))
+            return None
+        except IntegrityError:
+            return conn.execute(table.select().where(
+                table.c.user_id == ident['user_id'], table.c.endpoint == ident['endpoint'],
+                table.c.key == ident['key']
+            )).first()
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a JWT-protected POST route. The
+    first request with a key runs the view; its response is stored for
+    IDEMPOTENCY_KEY_TTL and replayed verbatim to retries with the same key
+    and body. A retry that arrives while the first request is still running
+    gets 409, and a key reused with a different body gets 422. Server errors
+    are not stored, so they can be retried.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters', 400)
+
+        table = IdempotencyKey.__table__
+        ident = {'user_id': int(get_jwt_identity()), 'endpoint': request.endpoint, 'key': key}
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+        lock_timeout = timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+
+        existing = _claim(table, ident, request_hash, now, ttl, lock_timeout)
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                return _error(f'{HEADER} was already used with a different request', 422)
+            if existing.status_code is None:
+                return _error('A request with this Idempotency-Key is still in progress', 409)
+            response = current_app.response_class(
+                existing.response_body, status=existing.status_code, mimetype='application/json'
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        where = (table.c.user_id == ident['user_id']) & (table.c.endpoint == ident['endpoint']) & \
+            (table.c.key == ident['key'])
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            with db.engine.begin() as conn:
+                conn.execute(table.delete().where(where))
+            raise
+        with db.engine.begin() as conn:
+            if response.status_code >= 500:
+                conn.execute(table.delete().where(where))
+            else:
+                conn.execute(table.update().where(where).values(
+                    status_code=response.status_code, response_body=response.get_data(as_text=True)
+                ))
+        return response
+    return wrapper
+
+
+def purge_expired_keys(now=None, batch_size=1000):
+    """Delete expired idempotency keys in small batches; returns the count"""
+    table = IdempotencyKey.__table__
+    now = now or datetime.utcnow()
+    purged = 0
+    while True:
+        with db.engine.begin() as conn:
+            keys = [
+                {'u': user_id, 'e': endpoint, 'k': key} for user_id, endpoint, key in conn.execute(
+                    db.select(table.c.user_id, table.c.endpoint, table.c.key)
+                    .where(table.c.expires_at <= now).limit(batch_size)
+                )
+            ]
+            if keys:
+                conn.execute(table.delete().where(
+                    table.c.user_id == bindparam('u'), table.c.endpoint == bindparam('e'),
+                    table.c.key == bindparam('k')
+                ), keys)
+        purged += len(keys)
+        if len(keys) < batch_size:
+            return purged
@@ -0,0 +1,254 @@
+from models import db, InsurancePlan
+from catalog import bump_catalog_version
+from migrations import apply_migrations
+from config import Config
+from sqlalchemy.exc import SQLAlchemyError
+from itertools import islice
+import csv
+import gzip
+import json
+import math
+import time
+
+REQUIRED_FIELDS = ('name', 'provider', 'type', 'coverage_amount', 'base_premium')
+NUMERIC_FIELDS = {
+    'coverage_amount': float,
+    'base_premium': float,
+    'age_min': int,
+    'age_max': int,
+    'salary_min': float,
+    'popularity_score': float,
+    'rating': float,
+}
+DEFAULTS = {
+    'description': None,
+    'features': [],
+    'age_min': 18,
+    'age_max': 100,
+    'salary_min': 0,
+    'popularity_score': 0,
+    'rating': 0,
+}
+
+
+class IngestReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.failed_chunks = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {
+            'rows_read': self.read,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'rejected': self.rejected,
+            'duplicates': self.duplicates,
+            'failed_chunks': self.failed_chunks,
+            'seconds': round(self.elapsed, 2),
+            'rows_per_second': round(self.read / self.elapsed, 1) if self.elapsed else 0.0
+        }
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_rows(path):
+    """
+    Stream raw rows from a CSV or JSONL file (optionally gzipped)
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    with _open(path) as f:
+        if name.endswith('.csv'):
+            yield from csv.DictReader(f)
+        elif name.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield {'_error': f'Invalid JSON: {e}'}
+        else:
+            raise ValueError('Catalog must be a .csv or .jsonl file')
+
+
+def _parse_features(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return [str(f).strip() for f in value if str(f).strip()]
+    value = str(value).strip()
+    if value.startswith('['):
+        return _parse_features(json.loads(value))
+    return [f.strip() for f in value.split('|') if f.strip()]
+
+
+def validate_row(raw):
+    """
+    Convert a raw row into an insurance_plans record.
+    Optional columns are only present when the row supplies them, so an
+    update never overwrites stored values with defaults.
+    Returns (record, None) or (None, error message).
+    """
+    if not isinstance(raw, dict):
+        return None, 'Row is not an object'
+    if raw.get('_error'):
+        return None, raw['_error']
+
+    missing = [field for field in REQUIRED_FIELDS if raw.get(field) in (None, '')]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+
+    record = {field: raw.get(field) for field in REQUIRED_FIELDS}
+    for field in DEFAULTS:
+        if raw.get(field) not in (None, ''):
+            record[field] = raw[field]
+
+    try:
+        for field, cast in NUMERIC_FIELDS.items():
+            if field not in record:
+                continue
+            value = float(record[field])
+            if not math.isfinite(value):
+                return None, f'{field} must be a finite number'
+            record[field] = cast(value)
+        if 'features' in record:
+            record['features'] = _parse_features(record['features'])
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid value: {e}'
+
+    record['name'] = str(record['name']).strip()
+    record['provider'] = str(record['provider']).strip()
+    if record['type'] not in Config.INSURANCE_TYPES:
+        return None, f"Unknown plan type: {record['type']}"
+    if record['coverage_amount'] <= 0 or record['base_premium'] <= 0:
+        return None, 'Coverage and base premium must be positive'
+    if record.get('age_min', DEFAULTS['age_min']) > record.get('age_max', DEFAULTS['age_max']):
+        return None, 'age_min is greater than age_max'
+    return record, None
+
+
+def _upsert_chunk(conn, records):
+    """
+    Insert new plans and update existing ones, matched on (provider, name).
+    Inserts fill missing optional columns with DEFAULTS; updates only write
+    the columns each row supplied.
+    """
+    table = InsurancePlan.__table__
+    # ingest_plans already dropped rows superseded within the chunk
+    by_key = {(r['provider'], r['name']): r for r in records}
+    existing = {}
+    for provider, name, plan_id in conn.execute(
+        db.select(table.c.provider, table.c.name, table.c.id)
+        .where(db.tuple_(table.c.provider, table.c.name).in_(list(by_key)))
+    ):
+        existing[(provider, name)] = plan_id
+
+    inserts = [dict(DEFAULTS, **r) for key, r in by_key.items() if key not in existing]
+    # executemany needs the same columns in every row, so group updates by column set
+    updates = {}
+    for key, r in by_key.items():
+        if key in existing:
+            updates.setdefault(tuple(sorted(r)), []).append(dict(r, _id=existing[key]))
+    if inserts:
+        conn.execute(table.insert(), inserts)
+    for columns, rows in updates.items():
+        conn.execute(
+            table.update().where(table.c.id == db.bindparam('_id'))
+            .values({column: db.bindparam(column) for column in columns}),
+            rows
+        )
+    return len(inserts), sum(len(rows) for rows in updates.values())
+
+
+def _drop_superseded(records):
+    """
+    Split (line, raw, record) entries into the last one for each
+    (provider, name) key and the earlier ones it supersedes
+    """
+    latest = {}
+    for entry in records:
+        latest[(entry[2]['provider'], entry[2]['name'])] = entry
+    kept, superseded = [], []
+    for entry in records:
+        later = latest[(entry[2]['provider'], entry[2]['name'])]
+        if later is entry:
+            kept.append(entry)
+        else:
+            superseded.append((entry, later[0]))
+    return kept, superseded
+
+
+def ingest_plans(path, chunk_size=1000, rejects_path=None, progress=None):
+    """
+    Stream a plan catalog into insurance_plans in bounded transactions,
+    bumping the catalog version once at the end. A chunk the database
+    refuses is rolled back and its rows reported as rejected; the run
+    carries on with the next chunk. When a chunk repeats a (provider, name)
+    key the last row wins, and the earlier ones are counted as duplicates
+    and written to the rejects file.
+    """
+    report = IngestReport()
+    rejects = open(rejects_path, 'w', encoding='utf-8') if rejects_path else None
+    # The (provider, name) upsert key needs its unique index
+    apply_migrations()
+    try:
+        rows = iter_rows(path)
+        line = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            records = []
+            for raw in chunk:
+                line += 1
+                record, error = validate_row(raw)
+                if record:
+                    records.append((line, raw, record))
+                    continue
+                report.rejected += 1
+                if rejects:
+                    rejects.write(json.dumps({'row': line, 'error': error, 'data': raw}, default=str) + '\n')
+            report.read += len(chunk)
+            records, superseded = _drop_superseded(records)
+            report.duplicates += len(superseded)
+            if rejects:
+                for (row, raw, _), later in superseded:
+                    error = f'Superseded by row {later} with the same provider and name'
+                    rejects.write(json.dumps({'row': row, 'error': error, 'data': raw}, default=str) + '\n')
+            if records:
+                try:
+                    with db.engine.begin() as conn:
+                        inserted, updated = _upsert_chunk(conn, [record for _, _, record in records])
+                except SQLAlchemyError as e:
+                    error = f'Chunk rejected by the database: {e.orig if getattr(e, "orig", None) else e}'
+                    report.failed_chunks += 1
+                    report.rejected += len(records)
+                    if rejects:
+                        for row, raw, _ in records:
+                            rejects.write(json.dumps({'row': row, 'error': error, 'data': raw}, default=str) + '\n')
+                else:
+                    report.inserted += inserted
+                    report.updated += updated
+            report.elapsed = time.perf_counter() - report.started
+            if progress:
+                progress(report)
+    finally:
+        if rejects:
+            rejects.close()
+        # Publish whatever was committed, even if the run stopped early
+        if report.inserted or report.updated:
+            with db.engine.begin() as conn:
+                bump_catalog_version(conn)
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
@@ -0,0 +1,91 @@
+"""
+Compare per-worker memory with and without preloading the app in the master.
+
+    python measure_memory.py --workers 4
+
+Starts gunicorn twice (preload on, then off), warms every worker with a
+few requests and reports RSS, PSS and USS per worker from
+/proc/<pid>/smaps_rollup. PSS and USS show how much of each worker is
+really private; with preload most of the catalog pages stay shared. Linux only.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+WARMUP_PATHS = ['/api/health', '/api/plans', '/api/plans/1/similar', '/api/plans/search?q=health']
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def _wait_ready(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/api/health', timeout=2).read()
+            return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def measure(preload, workers, port):
+    env = dict(os.environ, ORBIT_PRELOAD='1' if preload else '0', ORBIT_WORKERS=str(workers),
+               ORBIT_THREADS='1', ORBIT_BIND=f'127.0.0.1:{port}')
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        if not _wait_ready(base_url):
+            raise RuntimeError('gunicorn did not become ready')
+        # Enough requests that every worker has served each path
+        for _ in range(workers * 3):
+            for path in WARMUP_PATHS:
+                urllib.request.urlopen(base_url + path, timeout=30).read()
+        time.sleep(1)
+        return [_memory_kb(pid) for pid in _children(master.pid)]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'workers':>8}{'RSS/worker':>14}{'PSS/worker':>14}{'USS/worker':>14}{'PSS total':>12}")
+    for preload in (True, False):
+        stats = measure(preload, args.workers, args.port)
+        n = len(stats) or 1
+        avg = {k: sum(s[k] for s in stats) / n / 1024 for k in ('rss', 'pss', 'uss')}
+        total_pss = sum(s['pss'] for s in stats) / 1024
+        print(f"{'preload' if preload else 'naive':<10}{len(stats):>8}"
+              f"{avg['rss']:>11.1f} MB{avg['pss']:>11.1f} MB{avg['uss']:>11.1f} MB{total_pss:>9.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
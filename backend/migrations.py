@@ -0,0 +1,135 @@
+from models import db, User, InsurancePlan, Policy, Quote, SchemaMigration
+from sqlalchemy.exc import IntegrityError
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, processes migrate concurrently
+    fcntl = None
+
+
+def _create_index(table, name):
+    """
+    Create one of the indexes a model declares, if it is missing.
+    PostgreSQL builds it CONCURRENTLY so writes keep flowing; SQLite and
+    MySQL build it in place (their index builds are short on these tables).
+    """
+    index = next(i for i in table.indexes if i.name == name)
+    engine = db.engine
+    if engine.dialect.name == 'postgresql':
+        columns = ', '.join(c.name for c in index.columns)
+        unique = 'UNIQUE ' if index.unique else ''
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql(
+                f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table.name} ({columns})'
+            )
+    else:
+        index.create(engine, checkfirst=True)
+
+
+def _indexes(*indexes):
+    def apply():
+        for table, name in indexes:
+            _create_index(table, name)
+    return apply
+
+
+# Append only: (version, description, apply). Each migration must be safe to
+# re-run, because databases created by create_all() already have its result.
+MIGRATIONS = [
+    (1, 'policies (status, end_date) for the expiry sweeper',
+     _indexes((Policy.__table__, 'ix_policies_status_end_date'))),
+    (2, 'insurance_plans unique (provider, name) for catalog ingest',
+     _indexes((InsurancePlan.__table__, 'ix_insurance_plans_provider_name'))),
+    (3, 'per-user listing indexes on policies, quotes and plan type',
+     _indexes(
+         (Policy.__table__, 'ix_policies_user_status'),
+         (Policy.__table__, 'ix_policies_user_created'),
+         (Quote.__table__, 'ix_quotes_user_created'),
+         (InsurancePlan.__table__, 'ix_insurance_plans_type'),
+     )),
+]
+
+
+@contextmanager
+def migration_lock(lock_path):
+    """
+    Hold an exclusive lock on lock_path, so processes starting together on
+    one host create the schema and apply migrations one at a time
+    """
+    if not lock_path or fcntl is None:
+        yield
+        return
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def applied_versions():
+    return {row.version for row in db.session.execute(db.select(SchemaMigration.version))}
+
+
+def apply_migrations(progress=None):
+    """
+    Apply pending migrations in version order; returns the versions applied.
+    A version another process recorded first (e.g. on another host) counts
+    as applied, since every migration is safe to re-run.
+    """
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    done = applied_versions()
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version in done:
+            continue
+        apply()
+        db.session.add(SchemaMigration(version=version, description=description, applied_at=datetime.utcnow()))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            continue
+        applied.append(version)
+        if progress:
+            progress(version, description)
+    return applied
+
+
+def hot_queries(user_id=1):
+    """The per-request queries the routes issue, for plan inspection"""
+    policies, quotes = Policy.__table__, Quote.__table__
+    active = (policies.c.user_id == user_id) & (policies.c.status == 'active')
+    return {
+        'get_policies': db.select(policies).where(policies.c.user_id == user_id).order_by(policies.c.created_at.desc()),
+        'dashboard_active_policies': db.select(
+            db.func.count(), db.func.sum(policies.c.premium), db.func.sum(policies.c.coverage_amount)
+        ).where(active),
+        'get_quotes': db.select(quotes).where(quotes.c.user_id == user_id).order_by(quotes.c.created_at.desc()),
+        'dashboard_saved_quotes': db.select(db.func.count()).select_from(quotes).where(quotes.c.user_id == user_id),
+        'expiry_sweep': db.select(policies.c.id).where(
+            policies.c.status == 'active', policies.c.end_date <= datetime(2000, 1, 1)
+        ).order_by(policies.c.end_date).limit(500),
+        'login': db.select(User.__table__).where(User.__table__.c.email == 'user@example.com'),
+    }
+
+
+def explain_hot_queries():
+    """
+    EXPLAIN each hot query and report whether the plan uses an index.
+    Returns {name: (uses_index, plan_text)}.
+    """
+    engine = db.engine
+    dialect = engine.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    results = {}
+    with engine.connect() as conn:
+        for name, query in hot_queries().items():
+            sql = str(query.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            rows = conn.exec_driver_sql(prefix + sql).fetchall()
+            text = '\n'.join(' '.join(str(v) for v in row) for row in rows)
+            if dialect == 'sqlite':
+                uses_index = 'USING' in text and 'INDEX' in text
+            else:
+                uses_index = 'index' in text.lower()
+            results[name] = (uses_index, text)
+    return results
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from replicas import RoutingSession
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -40,6 +41,10 @@ class User(db.Model):
 
 class InsurancePlan(db.Model):
     __tablename__ = 'insurance_plans'
+    __table_args__ = (
+        db.Index('ix_insurance_plans_provider_name', 'provider', 'name', unique=True),
+        db.Index('ix_insurance_plans_type', 'type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -72,6 +77,11 @@ class InsurancePlan(db.Model):
 
 class Policy(db.Model):
     __tablename__ = 'policies'
+    __table_args__ = (
+        db.Index('ix_policies_status_end_date', 'status', 'end_date'),
+        db.Index('ix_policies_user_status', 'user_id', 'status'),
+        db.Index('ix_policies_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -87,19 +97,26 @@ class Policy(db.Model):
     
     plan = db.relationship('InsurancePlan', backref='policies')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_plan=True):
+        data = {
             'id': self.id,
             'policy_number': self.policy_number,
-            'plan': self.plan.to_dict(),
             'premium': self.premium,
             'coverage_amount': self.coverage_amount,
             'start_date': self.start_date.isoformat(),
             'status': self.status
         }
+        if include_plan:
+            data['plan'] = self.plan.to_dict()
+        else:
+            data['plan_id'] = self.plan_id
+        return data
 
 class Quote(db.Model):
     __tablename__ = 'quotes'
+    __table_args__ = (
+        db.Index('ix_quotes_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -111,10 +128,52 @@ class Quote(db.Model):
     
     plan = db.relationship('InsurancePlan', backref='quotes')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_plan=True):
+        data = {
             'id': self.id,
-            'plan': self.plan.to_dict(),
             'estimated_premium': self.estimated_premium,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+        if include_plan:
+            data['plan'] = self.plan.to_dict()
+        else:
+            data['plan_id'] = self.plan_id
+        return data
+
+class CatalogState(db.Model):
+    __tablename__ = 'catalog_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyPlanStats(db.Model):
+    __tablename__ = 'daily_plan_stats'
+    
+    day = db.Column(db.Date, primary_key=True)
+    plan_id = db.Column(db.Integer, db.ForeignKey('insurance_plans.id'), primary_key=True)
+    plan_type = db.Column(db.String(50), nullable=False, index=True)
+    provider = db.Column(db.String(100), nullable=False)
+    policies_issued = db.Column(db.Integer, nullable=False, default=0)
+    premium_total = db.Column(db.Float, nullable=False, default=0)
+    coverage_total = db.Column(db.Float, nullable=False, default=0)
+    quotes_saved = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    endpoint = db.Column(db.String(50), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)  # NULL while the first request is still running
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,79 @@
+from models import db, InsurancePlan, Policy, Quote
+from catalog import bump_catalog_version
+from analytics import _as_date
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam
+import numpy as np
+
+
+def _daily_activity(conn, since, policy_weight, quote_weight):
+    """
+    Weighted policy and quote counts per (plan, day) since a date, in one
+    grouped query over both tables
+    """
+    policies = db.select(
+        Policy.plan_id.label('plan_id'), db.func.date(Policy.created_at).label('day'),
+        db.literal(policy_weight).label('weight')
+    ).where(Policy.created_at >= since)
+    quotes = db.select(
+        Quote.plan_id.label('plan_id'), db.func.date(Quote.created_at).label('day'),
+        db.literal(quote_weight).label('weight')
+    ).where(Quote.created_at >= since)
+    events = db.union_all(policies, quotes).subquery()
+    return conn.execute(
+        db.select(events.c.plan_id, events.c.day, db.func.sum(events.c.weight))
+        .group_by(events.c.plan_id, events.c.day)
+    ).all()
+
+
+def recompute_popularity(half_life_days=30, window_days=180, policy_weight=1.0,
+                         quote_weight=0.25, min_events=20, now=None):
+    """
+    Recompute InsurancePlan.popularity_score from recent demand.
+
+    Each policy and quote counts with its weight, halved every half_life_days,
+    over the last window_days. Scores are log-scaled onto the seed data's
+    0-100 range relative to the most demanded plan. Changed scores are written
+    in one executemany together with a catalog version bump, so caches and
+    snapshots pick them up. With less than min_events of weighted activity
+    the existing scores are left alone.
+
+    Returns {'plans': n, 'updated': n, 'events': total_weight}.
+    """
+    today = (now or datetime.utcnow()).date()
+    since = datetime.combine(today - timedelta(days=window_days), datetime.min.time())
+    table = InsurancePlan.__table__
+
+    with db.engine.begin() as conn:
+        current = dict(conn.execute(db.select(table.c.id, table.c.popularity_score)).all())
+        rows = _daily_activity(conn, since, policy_weight, quote_weight)
+        plan_ids = np.fromiter(current, dtype=np.int64)
+        stats = {'plans': len(plan_ids), 'updated': 0,
+                 'events': round(float(sum(weight for _, _, weight in rows)), 2)}
+        if not len(plan_ids) or stats['events'] < min_events:
+            return stats
+
+        plan_ids.sort()
+        activity = np.array([(plan_id, (today - _as_date(day)).days, weight)
+                             for plan_id, day, weight in rows], dtype=float).reshape(-1, 3)
+        rows_of = np.searchsorted(plan_ids, activity[:, 0])
+        known = (rows_of < len(plan_ids)) & (plan_ids[np.minimum(rows_of, len(plan_ids) - 1)] == activity[:, 0])
+        decayed = activity[known, 2] * np.power(0.5, np.maximum(activity[known, 1], 0) / half_life_days)
+        demand = np.bincount(rows_of[known], weights=decayed, minlength=len(plan_ids))
+        if demand.max() <= 0:
+            return stats
+        scores = np.round(100 * np.log1p(demand) / np.log1p(demand.max()), 1)
+
+        changes = [
+            {'plan_id': int(plan_id), 'score': float(score)}
+            for plan_id, score in zip(plan_ids, scores)
+            if current[int(plan_id)] is None or abs(current[int(plan_id)] - score) >= 0.05
+        ]
+        if changes:
+            conn.execute(
+                table.update().where(table.c.id == bindparam('plan_id')).values(popularity_score=bindparam('score')),
+                changes
+            )
+            bump_catalog_version(conn)
+        stats['updated'] = len(changes)
+    return stats
@@ -3,9 +3,25 @@ import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 import pickle
 import os
 
+def round_money(values):
+    """
+    Round an array to 2 decimals exactly like Python's round(x, 2).
+    np.round scales by 100 before rounding, which can tip values lying next
+    to a half cent the other way; those few are re-rounded one by one.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) <= 1e-9 * np.maximum(1, np.abs(scaled))
+    if near_half.any():
+        rounded = np.array(rounded)
+        rounded[near_half] = [round(value, 2) for value in values[near_half].tolist()]
+    return rounded
+
 class InsuranceRecommendationEngine:
     def __init__(self):
         self.scaler = StandardScaler()
@@ -39,10 +55,10 @@ class InsuranceRecommendationEngine:
         """
         age = user_data.get('age', 30)
         salary = user_data.get('salary', 50000)
-        budget = user_data.get('budget', salary * 0.05)  # Default 5% of salary
+        budget = user_data.get('budget') or salary * 0.05  # Default 5% of salary
         preferred_type = user_data.get('insurance_type', None)
         
-        recommendations = []
+        eligible = []
         
         for plan in available_plans:
             # Filter by age eligibility
@@ -57,27 +73,33 @@ class InsuranceRecommendationEngine:
             if preferred_type and plan['type'] != preferred_type:
                 continue
             
-            # Calculate personalized premium
-            estimated_premium = self.calculate_premium(
-                plan['base_premium'],
-                age,
-                salary,
-                plan['coverage_amount'],
-                plan['type']
-            )
-            
-            # Calculate match score
-            score = self._calculate_match_score(
-                age, salary, budget, estimated_premium, 
-                plan['coverage_amount'], plan['popularity_score']
-            )
-            
+            eligible.append(plan)
+        
+        if not eligible:
+            return []
+        
+        # Price and score every eligible plan in one vectorized pass
+        coverage = np.array([plan['coverage_amount'] for plan in eligible], dtype=float)
+        premiums = self.calculate_premiums(
+            [plan['base_premium'] for plan in eligible],
+            age,
+            salary,
+            coverage,
+            [plan['type'] for plan in eligible]
+        )
+        scores = self._calculate_match_scores(
+            age, salary, budget, premiums, coverage,
+            np.array([plan['popularity_score'] for plan in eligible], dtype=float)
+        )
+        
+        recommendations = []
+        for plan, premium, score in zip(eligible, premiums.tolist(), scores.tolist()):
             recommendations.append({
                 'plan': plan,
-                'estimated_premium': estimated_premium,
+                'estimated_premium': premium,
                 'match_score': score,
-                'monthly_premium': round(estimated_premium / 12, 2),
-                'affordability': 'High' if estimated_premium < budget else 'Medium' if estimated_premium < budget * 1.5 else 'Low'
+                'monthly_premium': round(premium / 12, 2),
+                'affordability': 'High' if premium < budget else 'Medium' if premium < budget * 1.5 else 'Low'
             })
         
         # Sort by match score
@@ -85,55 +107,374 @@ class InsuranceRecommendationEngine:
         
         return recommendations[:top_n]
     
-    def _calculate_match_score(self, age, salary, budget, premium, coverage, popularity):
+    def get_recommendations_columnar(self, user_data, catalog, rows=None, top_n=5):
         """
-        Calculate how well a plan matches user profile
+        Vectorized get_recommendations over a ColumnarCatalog snapshot.
+        Scoring reads the mapped columns directly; only the top_n plans
+        are materialized as dicts.
+        """
+        age = user_data.get('age', 30)
+        salary = user_data.get('salary', 50000)
+        budget = user_data.get('budget') or salary * 0.05  # Default 5% of salary
+        preferred_type = user_data.get('insurance_type', None)
+        
+        rows = np.arange(len(catalog)) if rows is None else np.asarray(rows, dtype=np.int64)
+        type_codes = catalog.type_codes[rows]
+        
+        # Eligibility filters: age, salary requirement and preferred type
+        eligible = (catalog.column('age_min')[rows] <= age) & (age <= catalog.column('age_max')[rows])
+        eligible &= salary >= catalog.column('salary_min')[rows]
+        if preferred_type:
+            eligible &= type_codes == catalog.type_code(preferred_type)
+        rows, type_codes = rows[eligible], type_codes[eligible]
+        if not len(rows):
+            return []
+        
+        coverage = catalog.column('coverage_amount')[rows]
+        premiums = self.calculate_premiums(
+            catalog.column('base_premium')[rows],
+            age,
+            salary,
+            coverage,
+            np.array(catalog.type_names)[type_codes]
+        )
+        scores = self._calculate_match_scores(
+            age, salary, budget, premiums, coverage, catalog.column('popularity_score')[rows]
+        )
+        
+        # Highest score first; ties keep catalog order like the list version
+        top = np.arange(len(rows))
+        if len(top) > top_n:
+            cutoff = np.partition(-scores, top_n - 1)[top_n - 1]
+            top = np.flatnonzero(-scores <= cutoff)
+        top = top[np.lexsort((top, -scores[top]))][:top_n]
+        
+        recommendations = []
+        for i in top:
+            estimated_premium = float(premiums[i])
+            recommendations.append({
+                'plan': catalog.record(int(rows[i])),
+                'estimated_premium': estimated_premium,
+                'match_score': float(scores[i]),
+                'monthly_premium': round(estimated_premium / 12, 2),
+                'affordability': 'High' if estimated_premium < budget else 'Medium' if estimated_premium < budget * 1.5 else 'Low'
+            })
+        return recommendations
+    
+    def _calculate_match_scores(self, age, salary, budget, premium, coverage, popularity):
+        """
+        Vectorized match score over arrays of premiums, coverage and popularity
         """
         # Budget fit (40% weight)
-        budget_score = max(0, 100 - abs(premium - budget) / budget * 100) * 0.4
+        budget_score = np.maximum(0, 100 - np.abs(premium - budget) / budget * 100) * 0.4
         
         # Coverage to salary ratio (30% weight)
         ideal_coverage = salary * 10  # Ideal coverage is 10x salary
-        coverage_score = max(0, 100 - abs(coverage - ideal_coverage) / ideal_coverage * 100) * 0.3
+        coverage_score = np.maximum(0, 100 - np.abs(coverage - ideal_coverage) / ideal_coverage * 100) * 0.3
         
         # Popularity score (20% weight)
         popularity_score = popularity * 0.2
         
         # Age appropriateness (10% weight)
         if age < 30:
-            age_score = 10 if coverage > salary * 5 else 5
+            age_score = np.where(coverage > salary * 5, 10, 5)
         elif age < 50:
-            age_score = 10 if salary * 5 <= coverage <= salary * 15 else 5
+            age_score = np.where((salary * 5 <= coverage) & (coverage <= salary * 15), 10, 5)
         else:
-            age_score = 10 if coverage > salary * 8 else 5
+            age_score = np.where(coverage > salary * 8, 10, 5)
+        
+        return round_money(budget_score + coverage_score + popularity_score + age_score * 0.1)
+    
+    def _calculate_match_score(self, age, salary, budget, premium, coverage, popularity):
+        """
+        Calculate how well a plan matches user profile
+        """
+        return float(self._calculate_match_scores(age, salary, budget, premium, coverage, popularity))
+    
+    def calculate_premiums(self, base_premium, age, salary, coverage_amount, plan_type):
+        """
+        Vectorized calculate_premium; array arguments broadcast against each
+        other and every element matches the scalar result to the cent
+        """
+        base_premium = np.asarray(base_premium, dtype=float)
+        age = np.asarray(age, dtype=float)
+        salary = np.asarray(salary, dtype=float)
+        coverage_amount = np.asarray(coverage_amount, dtype=float)
+        
+        # Age factor (younger = lower premium for life, older = higher for health)
+        # 1.5% increase per year after 25 for Health/Life, 0.5% otherwise
+        age_rate = np.where(np.isin(plan_type, ['Health', 'Life']), 0.015, 0.005)
+        age_factor = 1 + (age - 25) * age_rate
+        
+        # Salary factor (higher salary = can afford better coverage)
+        salary_factor = np.clip(salary / 100000, 0.7, 1.5)
         
-        age_score *= 0.1
+        # Coverage factor
+        coverage_factor = coverage_amount / 1000000  # per million
         
-        total_score = budget_score + coverage_score + popularity_score + age_score
-        return round(total_score, 2)
+        # Calculate final premium
+        premium = base_premium * age_factor * salary_factor * (0.8 + coverage_factor * 0.2)
+        return round_money(premium)
     
-    def compare_plans(self, plan_ids, plans_data, user_data):
+    def calculate_premium_grid(self, plans, ages, salaries):
+        """
+        Premiums for every plan x age x salary combination in one broadcast
+        call; returns an array of shape (len(plans), len(ages), len(salaries))
+        """
+        column = lambda values: np.asarray(values).reshape(-1, 1, 1)
+        return self.calculate_premiums(
+            column([plan['base_premium'] for plan in plans]),
+            np.asarray(ages, dtype=float).reshape(1, -1, 1),
+            np.asarray(salaries, dtype=float).reshape(1, 1, -1),
+            column([plan['coverage_amount'] for plan in plans]),
+            column([plan['type'] for plan in plans])
+        )
+    
+    def compare_plans(self, plan_ids, plans_by_id, user_data):
         """
         Compare multiple insurance plans side by side
         """
-        comparison = []
-        
-        for plan_id in plan_ids:
-            plan = next((p for p in plans_data if p['id'] == plan_id), None)
-            if plan:
-                premium = self.calculate_premium(
-                    plan['base_premium'],
-                    user_data['age'],
-                    user_data['salary'],
-                    plan['coverage_amount'],
-                    plan['type']
-                )
-                
-                comparison.append({
-                    'plan': plan,
-                    'estimated_premium': premium,
-                    'monthly_premium': round(premium / 12, 2),
-                    'coverage_per_dollar': round(plan['coverage_amount'] / premium, 2)
-                })
-        
-        return comparison
\ No newline at end of file
+        return self.compare_plans_for_profiles(plan_ids, plans_by_id, [user_data])[0]
+    
+    def compare_plans_for_profiles(self, plan_ids, plans_by_id, profiles):
+        """
+        Compare plans for several user profiles at once, pricing the whole
+        profile x plan grid in one vectorized call. plans_by_id maps id -> plan.
+        """
+        if not isinstance(plans_by_id, dict):
+            plans_by_id = {p['id']: p for p in plans_by_id}
+        plans = [plans_by_id[plan_id] for plan_id in plan_ids if plan_id in plans_by_id]
+        if not plans:
+            return [[] for _ in profiles]
+        
+        coverage = np.array([p['coverage_amount'] for p in plans], dtype=float)
+        premiums = self.calculate_premiums(
+            [p['base_premium'] for p in plans],
+            np.array([profile['age'] for profile in profiles], dtype=float)[:, None],
+            np.array([profile['salary'] for profile in profiles], dtype=float)[:, None],
+            coverage,
+            [p['type'] for p in plans]
+        )
+        monthly = round_money(premiums / 12)
+        coverage_per_dollar = round_money(coverage / premiums)
+        
+        return [
+            [{
+                'plan': plan,
+                'estimated_premium': float(premiums[i, j]),
+                'monthly_premium': float(monthly[i, j]),
+                'coverage_per_dollar': float(coverage_per_dollar[i, j])
+            } for j, plan in enumerate(plans)]
+            for i in range(len(profiles))
+        ]
+
+def normalize_feature(feature):
+    """
+    Normalize a plan feature label into a lookup token
+    """
+    return ' '.join(str(feature).lower().replace('&', ' and ').split())
+
+
+class PlanSimilarityIndex:
+    """
+    Precomputed top-K content similarity neighbourhoods for insurance plans.
+    Neighbourhoods are row-aligned arrays of plan ids (padded with -1) and
+    scores, so an index can be saved next to a catalog snapshot and mapped
+    by every worker instead of being recomputed in each of them.
+    """
+    # Relative weight of each vector block (scaled numerics, type, features)
+    NUMERIC_WEIGHT = 0.5
+    TYPE_WEIGHT = 1.5
+    FEATURE_WEIGHT = 1.0
+    # Snapshot columns the vectors are built from, besides the plan type
+    NUMERIC_INPUTS = ('coverage_amount', 'base_premium', 'rating')
+    STRING_INPUTS = ('features',)
+    # Similarity matrix cells computed at once, to bound memory
+    BLOCK_CELLS = 1 << 22
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.types = []
+        self.vocabulary = []
+        self.mean = np.zeros(3)
+        self.scale = np.ones(3)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.neighbor_ids = np.full((0, top_k), -1, dtype=np.int64)
+        self.neighbor_scores = np.zeros((0, top_k))
+
+    def meta(self):
+        """JSON-serializable vector space, saved alongside arrays()"""
+        return {
+            'top_k': self.top_k, 'types': self.types, 'vocabulary': self.vocabulary,
+            'mean': self.mean.tolist(), 'scale': self.scale.tolist()
+        }
+
+    def arrays(self):
+        return {
+            'ids': self.ids,
+            'neighbor_ids': self.neighbor_ids.ravel(),
+            'neighbor_scores': self.neighbor_scores.ravel()
+        }
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Rebuild an index from meta() and arrays(), e.g. views onto a mapped file"""
+        index = cls(top_k=meta['top_k'])
+        index.types = meta['types']
+        index.vocabulary = meta['vocabulary']
+        index.mean = np.array(meta['mean'])
+        index.scale = np.array(meta['scale'])
+        index.ids = arrays['ids']
+        index.neighbor_ids = arrays['neighbor_ids'].reshape(-1, index.top_k)
+        index.neighbor_scores = arrays['neighbor_scores'].reshape(-1, index.top_k)
+        return index
+
+    @staticmethod
+    def _numeric(store):
+        return np.nan_to_num(np.column_stack([
+            np.log1p(store.column('coverage_amount')),
+            np.log1p(store.column('base_premium')),
+            store.column('rating'),
+        ]))
+
+    @staticmethod
+    def _tokens(store):
+        return [{normalize_feature(f) for f in features} for features in store.feature_lists()]
+
+    def _row_types(self, store):
+        return [store.type_names[code] for code in store.type_codes.tolist()]
+
+    def _vectorize(self, store, types, tokens):
+        """
+        Build unit-length vectors as a dense block of scaled numerics and a
+        sparse block of one-hot type and multi-hot features
+        """
+        numeric = (self._numeric(store) - self.mean) / self.scale * self.NUMERIC_WEIGHT
+        type_columns = {t: i for i, t in enumerate(self.types)}
+        feature_columns = {t: len(self.types) + i for i, t in enumerate(self.vocabulary)}
+        rows, columns, values = [], [], []
+        for row, (plan_type, plan_tokens) in enumerate(zip(types, tokens)):
+            rows.append(row)
+            columns.append(type_columns[plan_type])
+            values.append(self.TYPE_WEIGHT)
+            for token in plan_tokens:
+                rows.append(row)
+                columns.append(feature_columns[token])
+                values.append(self.FEATURE_WEIGHT)
+        categorical = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(len(types), len(type_columns) + len(feature_columns))
+        )
+        norms = np.sqrt((numeric ** 2).sum(axis=1) + np.asarray(categorical.multiply(categorical).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return numeric / norms[:, None], sparse.diags(1 / norms) @ categorical
+
+    @staticmethod
+    def _similarities(vectors, rows, columns=slice(None)):
+        numeric, categorical = vectors
+        return numeric[rows] @ numeric[columns].T + (categorical[rows] @ categorical[columns].T).toarray()
+
+    def _block(self, width):
+        return max(1, self.BLOCK_CELLS // max(width, 1))
+
+    def _nearest(self, vectors, rows):
+        """Top-K neighbours of rows among every plan, as (ids, scores) arrays"""
+        ids = np.full((len(rows), self.top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(rows), self.top_k))
+        k = min(self.top_k, len(self.ids) - 1)
+        if k <= 0:
+            return ids, scores
+        block = self._block(len(self.ids))
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            similarities = self._similarities(vectors, chunk)
+            similarities[np.arange(len(chunk)), chunk] = -np.inf
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_similarities = np.take_along_axis(similarities, top, axis=1)
+            order = np.lexsort((top, -top_similarities))
+            ids[start:start + len(chunk), :k] = self.ids[np.take_along_axis(top, order, axis=1)]
+            scores[start:start + len(chunk), :k] = np.round(np.take_along_axis(top_similarities, order, axis=1), 4)
+        return ids, scores
+
+    def build(self, store, types=None, tokens=None):
+        """
+        Fit the vector space on a full catalog store and compute every neighbourhood
+        """
+        types = self._row_types(store) if types is None else types
+        tokens = self._tokens(store) if tokens is None else tokens
+        self.types = sorted(set(types))
+        self.vocabulary = sorted(set().union(*tokens))
+        numeric = self._numeric(store)
+        self.mean = numeric.mean(axis=0) if len(numeric) else np.zeros(3)
+        self.scale = numeric.std(axis=0) if len(numeric) else np.ones(3)
+        self.scale[self.scale == 0] = 1
+        self.ids = np.array(store.ids, dtype=np.int64)
+        vectors = self._vectorize(store, types, tokens)
+        self.neighbor_ids, self.neighbor_scores = self._nearest(vectors, np.arange(len(self.ids)))
+
+    def update(self, previous, store, changed):
+        """
+        Index store starting from previous, the index of an earlier version.
+        changed flags the store rows that are new or whose vectorized fields
+        differ; only those rows and the ones that listed a changed or removed
+        plan are recomputed in full. Falls back to a full build when the
+        vector space itself has to change.
+        """
+        types = self._row_types(store)
+        tokens = self._tokens(store)
+        changed_rows = np.flatnonzero(changed)
+        known_types, known_tokens = set(previous.types), set(previous.vocabulary)
+        if (not len(previous.ids) or len(changed_rows) * 4 > len(store)
+                or not all(types[row] in known_types and tokens[row] <= known_tokens for row in changed_rows)):
+            self.build(store, types, tokens)
+            return
+
+        self.types, self.vocabulary = previous.types, previous.vocabulary
+        self.mean, self.scale = previous.mean, previous.scale
+        self.ids = np.array(store.ids, dtype=np.int64)
+        vectors = self._vectorize(store, types, tokens)
+        self.neighbor_ids = np.full((len(self.ids), self.top_k), -1, dtype=np.int64)
+        self.neighbor_scores = np.zeros((len(self.ids), self.top_k))
+
+        unchanged = np.flatnonzero(~np.asarray(changed, dtype=bool))
+        previous_rows = np.searchsorted(previous.ids, self.ids[unchanged])
+        kept_ids = previous.neighbor_ids[previous_rows]
+        kept_scores = previous.neighbor_scores[previous_rows]
+        stale_ids = np.concatenate([self.ids[changed_rows], np.setdiff1d(previous.ids, self.ids)])
+        # A former neighbour moved, so the next best candidate is unknown
+        stale = np.isin(kept_ids, stale_ids).any(axis=1)
+        recompute = np.concatenate([changed_rows, unchanged[stale]])
+        self.neighbor_ids[recompute], self.neighbor_scores[recompute] = self._nearest(vectors, recompute)
+
+        merge, kept_ids, kept_scores = unchanged[~stale], kept_ids[~stale], kept_scores[~stale]
+        if not len(changed_rows):
+            self.neighbor_ids[merge], self.neighbor_scores[merge] = kept_ids, kept_scores
+            return
+        changed_ids = self.ids[changed_rows]
+        block = self._block(len(changed_rows))
+        for start in range(0, len(merge), block):
+            chunk = merge[start:start + block]
+            end = start + len(chunk)
+            candidate_ids = np.hstack([kept_ids[start:end], np.broadcast_to(changed_ids, (len(chunk), len(changed_ids)))])
+            candidate_scores = np.hstack([
+                np.where(kept_ids[start:end] >= 0, kept_scores[start:end], -np.inf),
+                np.round(self._similarities(vectors, chunk, changed_rows), 4)
+            ])
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :self.top_k]
+            best_ids = np.take_along_axis(candidate_ids, order, axis=1)
+            best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            padding = np.isneginf(best_scores)
+            best_ids[padding], best_scores[padding] = -1, 0
+            self.neighbor_ids[chunk, :best_ids.shape[1]] = best_ids
+            self.neighbor_scores[chunk, :best_ids.shape[1]] = best_scores
+
+    def similar(self, plan_id, limit=None):
+        """
+        Return [(plan_id, similarity), ...] for the nearest plans
+        """
+        row = int(np.searchsorted(self.ids, plan_id))
+        if row >= len(self.ids) or self.ids[row] != plan_id:
+            return []
+        ids = self.neighbor_ids[row]
+        count = int(np.count_nonzero(ids >= 0))
+        neighbors = list(zip(ids[:count].tolist(), self.neighbor_scores[row, :count].tolist()))
+        return neighbors[:limit] if limit else neighbors
@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+from utils.admission import client_key
+import itertools
+import math
+import threading
+import time
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_COOKIE = 'orbit_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a list of replica URLs"""
+    return {f'{REPLICA_BIND_PREFIX}{i}': url for i, url in enumerate(urls)}
+
+
+def _replica_engine(engines):
+    if not has_request_context() or not g.get('read_from_replica') or g.get('primary_depth'):
+        return None
+    router = current_app.extensions.get('read_router')
+    return router.pick(engines) if router else None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica while the current request has
+    been marked replica-safe by ReadRouter. Flushes and DML always go to
+    the primary, and once a request has written anything the rest of its
+    reads stay on the primary too.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                if has_request_context():
+                    g.read_from_replica = False
+            else:
+                engine = _replica_engine(self._db.engines)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_from_primary():
+    """Force session reads inside the block onto the primary"""
+    if not has_request_context():
+        yield
+        return
+    g.primary_depth = g.get('primary_depth', 0) + 1
+    try:
+        yield
+    finally:
+        g.primary_depth -= 1
+
+
+class ReadRouter:
+    """
+    Decides per request whether session reads may use a replica: GET and
+    HEAD requests do, unless the client wrote something within the last
+    REPLICA_STICKY_SECONDS (read-your-writes). Stickiness is tracked per
+    user (or IP) in this process and in a short-lived cookie, so browsers
+    stay pinned even when their next request lands on another worker.
+    """
+    def __init__(self, app=None):
+        self.keys = []
+        self.sticky_until = {}
+        self.replica_requests = 0
+        self.primary_requests = 0
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.keys = sorted(k for k in app.config.get('SQLALCHEMY_BINDS', {}) if k.startswith(REPLICA_BIND_PREFIX))
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.max_sticky = app.config['REPLICA_MAX_STICKY_CLIENTS']
+        app.extensions['read_router'] = self
+        if self.keys:
+            app.before_request(self.before_request)
+            app.after_request(self.after_request)
+
+    def pick(self, engines):
+        """Round-robin over the configured replicas"""
+        return engines[self.keys[next(self._next) % len(self.keys)]]
+
+    def _is_sticky(self, key):
+        try:
+            if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        with self._lock:
+            until = self.sticky_until.get(key)
+            return until is not None and until > time.monotonic()
+
+    def _mark_sticky(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if len(self.sticky_until) >= self.max_sticky:
+                self.sticky_until = {k: t for k, t in self.sticky_until.items() if t > now}
+            self.sticky_until[key] = now + self.sticky_seconds
+
+    def before_request(self):
+        g.client_key = client_key()
+        g.read_from_replica = request.method in READ_METHODS and not self._is_sticky(g.client_key)
+        with self._lock:
+            if g.read_from_replica:
+                self.replica_requests += 1
+            else:
+                self.primary_requests += 1
+
+    def after_request(self, response):
+        if request.method not in READ_METHODS and request.method != 'OPTIONS' and response.status_code < 400:
+            self._mark_sticky(g.get('client_key'))
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.3f}',
+                max_age=math.ceil(self.sticky_seconds), httponly=True, samesite='Lax'
+            )
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'replicas': len(self.keys),
+                'replica_requests': self.replica_requests,
+                'primary_requests': self.primary_requests,
+                'sticky_clients': len(self.sticky_until)
+            }
+
+
+def sync_sqlite_replicas(db):
+    """Copy the primary into every SQLite replica with the online backup API"""
+    router = current_app.extensions['read_router']
+    source = db.engine.raw_connection()
+    try:
+        for key in router.keys:
+            engine = db.engines[key]
+            if engine.dialect.name != 'sqlite' or db.engine.dialect.name != 'sqlite':
+                raise ValueError(f'{key} is not a SQLite replica of a SQLite primary')
+            target = engine.raw_connection()
+            try:
+                source.driver_connection.backup(target.driver_connection)
+            finally:
+                target.close()
+    finally:
+        source.close()
+    return list(router.keys)
@@ -0,0 +1,112 @@
+from sqlalchemy import text
+from models import db, InsurancePlan
+import re
+
+# bm25 column weights: name, provider, description, features
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS plan_search USING fts5(
+        name, provider, description, features,
+        content='insurance_plans', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS plan_search_ai AFTER INSERT ON insurance_plans BEGIN
+        INSERT INTO plan_search(rowid, name, provider, description, features)
+        VALUES (new.id, new.name, new.provider, new.description, new.features);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS plan_search_ad AFTER DELETE ON insurance_plans BEGIN
+        INSERT INTO plan_search(plan_search, rowid, name, provider, description, features)
+        VALUES ('delete', old.id, old.name, old.provider, old.description, old.features);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS plan_search_au
+    AFTER UPDATE OF name, provider, description, features ON insurance_plans BEGIN
+        INSERT INTO plan_search(plan_search, rowid, name, provider, description, features)
+        VALUES ('delete', old.id, old.name, old.provider, old.description, old.features);
+        INSERT INTO plan_search(rowid, name, provider, description, features)
+        VALUES (new.id, new.name, new.provider, new.description, new.features);
+    END
+    """,
+]
+
+
+class PlanSearch:
+    """
+    Full-text plan search. Uses an FTS5 index kept in sync with insurance_plans
+    by triggers, and falls back to LIKE matching where FTS5 is unavailable.
+    """
+    def __init__(self):
+        self.fts_enabled = False
+
+    def setup(self):
+        """Create the FTS5 table and triggers, backfilling the index on first run"""
+        self.fts_enabled = False
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        try:
+            with db.engine.begin() as conn:
+                existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'plan_search'"
+                )).first() is not None
+                for statement in FTS_SCHEMA:
+                    conn.execute(text(statement))
+                if not existed:
+                    conn.execute(text("INSERT INTO plan_search(plan_search) VALUES ('rebuild')"))
+        except Exception as e:
+            print(f"⚠️ Full-text search unavailable, using LIKE fallback: {e}")
+            return False
+        self.fts_enabled = True
+        return True
+
+    @staticmethod
+    def terms(query):
+        """Split free text into search terms, dropping FTS operators and punctuation"""
+        return re.findall(r'\w+', query.lower())
+
+    def search(self, query, plan_type=None, limit=20):
+        """
+        Return [(plan_id, score), ...] best match first
+        """
+        terms = self.terms(query)
+        if not terms:
+            return []
+        if self.fts_enabled:
+            return self._search_fts(terms, plan_type, limit)
+        return self._search_like(terms, plan_type, limit)
+
+    def _search_fts(self, terms, plan_type, limit):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            "SELECT plan_search.rowid, bm25(plan_search, {}) AS rank FROM plan_search "
+            "JOIN insurance_plans ON insurance_plans.id = plan_search.rowid "
+            "WHERE plan_search MATCH :match"
+        ).format(', '.join(str(w) for w in BM25_WEIGHTS))
+        params = {'match': match, 'limit': limit}
+        if plan_type:
+            sql += " AND insurance_plans.type = :type"
+            params['type'] = plan_type
+        sql += " ORDER BY rank LIMIT :limit"
+        rows = db.session.execute(text(sql), params)
+        # bm25 is lower-is-better; report it as a positive relevance score
+        return [(plan_id, round(-rank, 4)) for plan_id, rank in rows]
+
+    def _search_like(self, terms, plan_type, limit):
+        columns = [
+            InsurancePlan.name,
+            InsurancePlan.provider,
+            InsurancePlan.description,
+            db.cast(InsurancePlan.features, db.Text),
+        ]
+        query = db.session.query(InsurancePlan.id)
+        for term in terms:
+            query = query.filter(db.or_(*[column.ilike(f'%{term}%') for column in columns]))
+        if plan_type:
+            query = query.filter(InsurancePlan.type == plan_type)
+        rows = query.order_by(InsurancePlan.name).limit(limit).all()
+        return [(plan_id, None) for plan_id, in rows]
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from flask import g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+import math
+import threading
+import time
+
+
+def client_key():
+    """
+    The JWT identity when a valid token is present, else the client IP.
+    Behind a reverse proxy set PROXY_FIX_X_FOR so remote_addr is the client,
+    not the proxy every request arrives from.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is not None:
+        return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        """Take one token; return 0 on success or seconds until one is available"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+
+class RouteLimit:
+    def __init__(self, endpoint, concurrency=None, queue_timeout=0.0, rate=None, burst=None):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst or (math.ceil(rate) if rate else None)
+        self.slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_busy = 0
+
+
+class AdmissionController:
+    """
+    In-process admission control for expensive endpoints. Each limited
+    endpoint gets a concurrency cap (a request waits at most queue_timeout
+    for a slot, then gets a 503) and a token bucket per user or client IP
+    (429 when empty). Both rejections carry Retry-After, and cheap routes
+    keep their workers because expensive ones can no longer hold them all.
+    """
+    def __init__(self, app=None):
+        self.limits = {}
+        self.buckets = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['ADMISSION_CONTROL_ENABLED']
+        self.max_buckets = app.config['ADMISSION_MAX_BUCKETS']
+        self.limits = {
+            endpoint: RouteLimit(endpoint, **settings)
+            for endpoint, settings in app.config['ADMISSION_ROUTE_LIMITS'].items()
+        }
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+
+    @staticmethod
+    def _reject(status, message, retry_after):
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _take_token(self, limit, now):
+        key = (limit.endpoint, client_key())
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(limit.burst, now)
+                while len(self.buckets) > self.max_buckets:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.take(limit.rate, limit.burst, now)
+
+    def before_request(self):
+        limit = self.limits.get(request.endpoint) if self.enabled else None
+        if limit is None or request.method == 'OPTIONS':
+            return None
+
+        if limit.rate:
+            wait = self._take_token(limit, time.monotonic())
+            if wait:
+                with self._lock:
+                    limit.rejected_rate += 1
+                return self._reject(429, 'Too many requests, slow down', wait)
+
+        if limit.slots is not None:
+            if not limit.slots.acquire(timeout=limit.queue_timeout):
+                with self._lock:
+                    limit.rejected_busy += 1
+                return self._reject(503, 'Server busy, try again shortly', limit.queue_timeout or 1)
+            g.admission_slot = limit
+
+        with self._lock:
+            limit.admitted += 1
+            limit.in_flight += 1 if limit.slots is not None else 0
+        return None
+
+    def teardown_request(self, exc=None):
+        limit = g.pop('admission_slot', None)
+        if limit is not None:
+            with self._lock:
+                limit.in_flight -= 1
+            limit.slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'tracked_clients': len(self.buckets),
+                'routes': {
+                    endpoint: {
+                        'concurrency': limit.concurrency,
+                        'in_flight': limit.in_flight,
+                        'admitted': limit.admitted,
+                        'rejected_rate_limited': limit.rejected_rate,
+                        'rejected_busy': limit.rejected_busy
+                    }
+                    for endpoint, limit in self.limits.items()
+                }
+            }
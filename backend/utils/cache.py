@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import json
+import threading
+
+
+class RecommendationCache:
+    """
+    Memory-bounded LRU cache of recommendation results.
+    Entries are keyed by a canonical user profile and belong to one catalog
+    version; the whole cache is dropped as soon as a newer version is seen.
+    """
+    def __init__(self, max_bytes=16 * 1024 * 1024, salary_step=0, budget_step=0):
+        self.max_bytes = max_bytes
+        self.salary_step = salary_step
+        self.budget_step = budget_step
+        self.version = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _quantize(value, step):
+        if value is None or not step:
+            return value
+        return round(float(value) / step) * step
+
+    def canonical_profile(self, user_data):
+        """
+        Return the profile with salary and budget snapped to their buckets,
+        so every user in a bucket is scored (and cached) identically
+        """
+        profile = dict(user_data)
+        profile['salary'] = self._quantize(profile.get('salary'), self.salary_step)
+        profile['budget'] = self._quantize(profile.get('budget'), self.budget_step)
+        return profile
+
+    @staticmethod
+    def make_key(profile, top_n, must_have=(), exclude=()):
+        return (
+            profile.get('age'),
+            profile.get('salary'),
+            profile.get('budget'),
+            profile.get('insurance_type'),
+            top_n,
+            tuple(sorted(must_have)),
+            tuple(sorted(exclude)),
+        )
+
+    def _sync_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.size = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._sync_version(version)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, version, value):
+        size = len(json.dumps(value, default=str)) + len(repr(key))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._sync_version(version)
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'catalog_version': self.version
+            }
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from flask import request
+import hashlib
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/x-ndjson', 'image/svg+xml',
+)
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def _gzip_compressor(level):
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+class ResponseCompressor:
+    """
+    after_request middleware that gzip/brotli-compresses responses the
+    client accepts, above a size threshold. Streamed responses are
+    compressed chunk by chunk; bodies of cacheable endpoints are kept
+    precompressed in a small LRU keyed by content digest.
+    """
+    def __init__(self, app=None):
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        self.cache_entries = app.config['COMPRESSION_CACHE_ENTRIES']
+        self.cacheable_endpoints = set(app.config['COMPRESSION_CACHEABLE_ENDPOINTS'])
+        app.after_request(self.after_request)
+
+    def choose_encoding(self, header):
+        codings = parse_accept_encoding(header)
+        wildcard = codings.get('*', 0)
+        candidates = (['br'] if brotli else []) + ['gzip']
+        best, best_q = None, 0
+        for coding in candidates:
+            q = codings.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        compressor = _gzip_compressor(self.gzip_level)
+        return compressor.compress(data) + compressor.flush()
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                data = compressor.process(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+            return
+        compressor = _gzip_compressor(self.gzip_level)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def _cached(self, data, encoding):
+        key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+        with self._lock:
+            body = self.cache.get(key)
+            if body is not None:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return body
+            self.cache_misses += 1
+        body = self.compress(data, encoding)
+        with self._lock:
+            self.cache[key] = body
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return body
+
+    def after_request(self, response):
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding'))
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        if request.method == 'GET' and request.endpoint in self.cacheable_endpoints:
+            body = self._cached(data, encoding)
+        else:
+            body = self.compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'brotli_available': brotli is not None,
+                'responses_compressed': self.compressed,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                'cache_entries': len(self.cache),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses
+            }
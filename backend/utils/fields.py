@@ -0,0 +1,52 @@
+PLAN_FIELDS = (
+    'id', 'name', 'provider', 'type', 'coverage_amount', 'base_premium',
+    'description', 'features', 'age_range', 'rating',
+)
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+def parse_plan_fields(value):
+    """
+    Parse a comma-separated fields= value into a tuple of plan attributes.
+    None means every field; 'id' is always included.
+    """
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = sorted(set(fields) - set(PLAN_FIELDS))
+    if unknown:
+        raise FieldsetError(f"Unknown plan fields: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(dict.fromkeys(fields))
+
+
+def select_fields(plan, fields):
+    if fields is None:
+        return plan
+    return {field: plan[field] for field in fields if field in plan}
+
+
+def shape_items(items, fields=None, normalized=False):
+    """
+    Apply a fieldset to the 'plan' embedded in each item. In normalized mode
+    each item gets a 'plan_id' instead and every distinct plan is returned
+    once in a side map. Returns (items, plans); plans is None unless normalized.
+    Items are copied, never mutated, so cached results can be shaped safely.
+    """
+    plans = {} if normalized else None
+    shaped = []
+    for item in items:
+        item = dict(item)
+        plan = item.pop('plan')
+        if normalized:
+            item['plan_id'] = plan['id']
+            if str(plan['id']) not in plans:
+                plans[str(plan['id'])] = select_fields(plan, fields)
+        else:
+            item['plan'] = select_fields(plan, fields)
+        shaped.append(item)
+    return shaped, plans
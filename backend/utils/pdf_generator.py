@@ -1,7 +1,7 @@
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from datetime import datetime
@@ -35,17 +35,47 @@ class PolicyPDFGenerator:
             spaceBefore=12
         )
     
-    def generate_policy_document(self, policy_data, user_data):
+    def generate_policy_document(self, policy_data, user_data, output=None):
         """
-        Generate a professional insurance policy PDF
+        Generate a professional insurance policy PDF. It is written to the
+        output folder unless output (a path or file-like object) is given.
         """
-        filename = f"policy_{policy_data['policy_number']}.pdf"
-        filepath = os.path.join(self.output_folder, filename)
+        if output is None:
+            filename = f"policy_{policy_data['policy_number']}.pdf"
+            output = os.path.join(self.output_folder, filename)
         
-        doc = SimpleDocTemplate(filepath, pagesize=letter,
+        doc = SimpleDocTemplate(output, pagesize=letter,
                                 rightMargin=72, leftMargin=72,
                                 topMargin=72, bottomMargin=18)
+        doc.build(self.policy_story(policy_data, user_data))
         
+        return output
+    
+    def generate_bundle_document(self, policies_data, user_data, output=None):
+        """
+        Generate one PDF holding the certificates of several policies,
+        one per page, bought together by the same policyholder
+        """
+        if output is None:
+            filename = f"bundle_{policies_data[0]['policy_number']}.pdf"
+            output = os.path.join(self.output_folder, filename)
+        
+        doc = SimpleDocTemplate(output, pagesize=letter,
+                                rightMargin=72, leftMargin=72,
+                                topMargin=72, bottomMargin=18)
+        story = []
+        for i, policy_data in enumerate(policies_data):
+            if i:
+                story.append(PageBreak())
+            story.extend(self.policy_story(policy_data, user_data))
+        doc.build(story)
+        
+        return output
+    
+    def policy_story(self, policy_data, user_data):
+        """
+        Build the flowables for one policy certificate
+        """
         story = []
         
         # Header
@@ -143,7 +173,4 @@ class PolicyPDFGenerator:
         footer_text = f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}"
         story.append(Paragraph(footer_text, self.styles['Italic']))
         
-        # Build PDF
-        doc.build(story)
-        
-        return filepath
\ No newline at end of file
+        return story
\ No newline at end of file
@@ -62,4 +62,13 @@ def generate_policy_number():
     import string
     timestamp = datetime.now().strftime('%Y%m%d')
     random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"ORB-{timestamp}-{random_str}"
\ No newline at end of file
+    return f"ORB-{timestamp}-{random_str}"
+
+def generate_policy_numbers(count, taken=()):
+    """Generate count distinct policy numbers, none of them in taken"""
+    numbers = set()
+    while len(numbers) < count:
+        number = generate_policy_number()
+        if number not in taken:
+            numbers.add(number)
+    return list(numbers)
\ No newline at end of file
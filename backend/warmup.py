@@ -0,0 +1,106 @@
+from datetime import datetime
+import threading
+import time
+
+
+class Warmup:
+    """
+    Runs a list of named warm-up steps once per process and reports
+    readiness. Steps run synchronously (gunicorn master before forking) or
+    in a background thread (each worker, or the dev server), and the first
+    request starts them if nothing else did. A failing step is recorded
+    and the remaining steps still run. The process is ready once every
+    step ran and no critical step failed; failed critical steps are retried
+    in the background, at most every retry_seconds, as requests come in.
+    """
+    def __init__(self, app=None, steps=(), retry_seconds=5):
+        self.steps = list(steps)
+        self.retry_seconds = retry_seconds
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}
+        self.errors = {}
+        self._started = False
+        self._running = False
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._ensure_started)
+
+    def add_step(self, name, critical=False):
+        def register(step):
+            self.steps.append((name, step, critical))
+            return step
+        return register
+
+    @property
+    def failed_critical(self):
+        return [name for name, _, critical in self.steps if critical and name in self.errors]
+
+    @property
+    def ready(self):
+        return self.finished_at is not None and not self.failed_critical
+
+    def _claim(self):
+        """Return the steps to run now (all at first, then failed critical ones), or None"""
+        with self._lock:
+            if self._running:
+                return None
+            if self._started:
+                steps = [s for s in self.steps if s[2] and s[0] in self.errors]
+                if not steps or time.monotonic() - self._last_attempt < self.retry_seconds:
+                    return None
+            else:
+                steps = self.steps
+                self._started = True
+                self.started_at = datetime.utcnow()
+            self._running = True
+            self._last_attempt = time.monotonic()
+            return steps
+
+    def _ensure_started(self):
+        if not self._started or (self.finished_at and self.failed_critical):
+            self.start()
+
+    def _run_steps(self, steps):
+        for name, step, critical in steps:
+            began = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    step()
+                self.errors.pop(name, None)
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"Warm-up step {name} failed: {e}")
+            self.timings[name] = round((time.perf_counter() - began) * 1000, 1)
+        self.finished_at = datetime.utcnow()
+        self._running = False
+
+    def run(self):
+        """Warm up in the calling thread"""
+        steps = self._claim()
+        if steps is not None:
+            self._run_steps(steps)
+
+    def start(self):
+        """Warm up in a background thread"""
+        steps = self._claim()
+        if steps is not None:
+            threading.Thread(target=self._run_steps, args=(steps,), name='warmup', daemon=True).start()
+
+    def status(self):
+        if self.ready:
+            status = 'ready'
+        else:
+            status = 'failed' if self.finished_at and not self._running else 'warming'
+        return {
+            'status': status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'steps_ms': dict(self.timings),
+            'errors': dict(self.errors)
+        }